@@ -0,0 +1,146 @@
+"""
+Admission Control for Agent Turns
+Bounds concurrent turns with a global limiter and a bounded wait queue,
+serializes turns per session, and caps concurrent calls to the ML service.
+When the queue is full, callers get Overloaded immediately (served as 429)
+instead of piling up until upstream services throttle us.
+
+Turns waiting for their session's lock count as queued too. Each session may
+have MAX_QUEUED_TURNS_PER_SESSION turns waiting behind the running one (per
+worker); further turns on that session are rejected straight away.
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from .metrics import ADMISSION_REJECTED, TURNS_IN_FLIGHT, TURNS_QUEUED
+from .shared_state import LockTimeout, get_state_store
+
+MAX_CONCURRENT_TURNS = int(os.getenv("AGENT_MAX_CONCURRENT_TURNS", "8"))
+MAX_QUEUED_TURNS = int(os.getenv("AGENT_MAX_QUEUED_TURNS", "32"))
+QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "10"))
+SESSION_LOCK_TIMEOUT = float(os.getenv("AGENT_SESSION_LOCK_TIMEOUT", "30"))
+MAX_QUEUED_TURNS_PER_SESSION = int(os.getenv("AGENT_MAX_QUEUED_TURNS_PER_SESSION", "1"))
+ML_MAX_CONCURRENCY = int(os.getenv("ML_MAX_CONCURRENCY", "16"))
+
+
+class Overloaded(Exception):
+    """Raised when a turn cannot be admitted; carries a Retry-After hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global concurrency limit for agent turns with a bounded wait queue."""
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_TURNS,
+        max_queue: int = MAX_QUEUED_TURNS,
+        queue_timeout: float = QUEUE_TIMEOUT,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._in_flight = 0
+        # Turns waiting for a session lock, and turns admitted per session (running or waiting)
+        self._lock_waiting = 0
+        self._session_turns: dict[str, int] = {}
+        # Moving average of how long a turn holds its slot, for Retry-After
+        self._avg_turn_seconds = 1.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting + self._lock_waiting
+
+    def retry_after(self) -> int:
+        """Estimated seconds until the current queue drains."""
+        backlog = (self.waiting + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(backlog * self._avg_turn_seconds))
+
+    def _reject(self, reason: str, retry_after: Optional[int] = None) -> Overloaded:
+        ADMISSION_REJECTED.inc(reason=reason)
+        return Overloaded(reason, retry_after if retry_after is not None else self.retry_after())
+
+    def _queue_full(self) -> bool:
+        return self._in_flight + self.waiting >= self.max_concurrent + self.max_queue
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the global turn slots for the duration of the block."""
+        # Counters change synchronously, so this check cannot race with other callers
+        if self._queue_full():
+            raise self._reject("queue_full")
+
+        self._waiting += 1
+        TURNS_QUEUED.set(self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout")
+        finally:
+            self._waiting -= 1
+            TURNS_QUEUED.set(self.waiting)
+
+        self._in_flight += 1
+        TURNS_IN_FLIGHT.set(self._in_flight)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._avg_turn_seconds = 0.8 * self._avg_turn_seconds + 0.2 * elapsed
+            self._in_flight -= 1
+            TURNS_IN_FLIGHT.set(self._in_flight)
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def turn(self, session_id: str):
+        """Admit one turn: serialize on the session first, then take a global slot."""
+        # Checked and counted synchronously, so concurrent requests can't both slip in
+        active = self._session_turns.get(session_id, 0)
+        if active > MAX_QUEUED_TURNS_PER_SESSION:
+            # The session already has a turn running and its queue is full: one turn ahead at least
+            raise self._reject("session_busy", max(1, math.ceil(self._avg_turn_seconds)))
+        if self._queue_full():
+            raise self._reject("queue_full")
+
+        self._session_turns[session_id] = active + 1
+        self._lock_waiting += 1
+        TURNS_QUEUED.set(self.waiting)
+        locked = False
+        try:
+            async with get_state_store().session_lock(session_id, timeout=SESSION_LOCK_TIMEOUT):
+                locked = True
+                self._lock_waiting -= 1
+                TURNS_QUEUED.set(self.waiting)
+                async with self.slot():
+                    yield
+        except LockTimeout:
+            raise self._reject("session_busy")
+        finally:
+            if not locked:
+                self._lock_waiting -= 1
+                TURNS_QUEUED.set(self.waiting)
+            remaining = self._session_turns[session_id] - 1
+            if remaining:
+                self._session_turns[session_id] = remaining
+            else:
+                del self._session_turns[session_id]
+
+
+# Global limiters
+admission = AdmissionController()
+ml_limiter = asyncio.Semaphore(ML_MAX_CONCURRENCY)
@@ -1,38 +1,28 @@
 """
 Dubai RTA City Planning Agent - Main Agent Definition
 Uses Google's Agent Development Kit (ADK) with Gemini model.
+
+The ADK and GenAI SDKs are heavy to import, so the client and agent are built
+lazily on first use; `root_agent` and `client` stay importable as before.
 """
 import os
-from pathlib import Path
-from dotenv import load_dotenv
-
-# Load environment variables from agent/.env
-_agent_dir = Path(__file__).parent
-load_dotenv(_agent_dir / ".env")
-
-api_key = os.getenv("GOOGLE_API_KEY")
-if api_key:
-    print(f"🔑 Loaded Google API Key: {api_key[:8]}...{api_key[-4:]}")
-    # Force ADK/GenAI to use this key and ignore potentially stale cloud credentials
-    os.environ["GENAI_API_KEY"] = api_key
-    if "GOOGLE_APPLICATION_CREDENTIALS" in os.environ:
-        print("⚠️  Warning: GOOGLE_APPLICATION_CREDENTIALS found. Unsetting to prefer API Key.")
-        del os.environ["GOOGLE_APPLICATION_CREDENTIALS"]
-else:
-    print("❌ Google API Key NOT found in environment!")
-
-from google.adk.agents import Agent
-from google.adk.tools import google_search
-# Ensure genai is configured (ADK might do this, but being explicit helps)
-import google.genai as genai
+from functools import lru_cache
 
-client = genai.Client(api_key=api_key)
+from .config import load_environment
 
-from .tools import get_ml_predictions, analyze_transport_coverage, get_area_statistics
+load_environment()
 
 # Agent configuration
 AGENT_MODEL = os.getenv("AGENT_MODEL", "gemini-2.0-flash")
 
+# Per-tool timeout budgets in seconds; other tools use TOOL_TIMEOUT
+TOOL_TIMEOUTS = {
+    # Room for the ML client's own 30s timeout plus waiting on ML_MAX_CONCURRENCY
+    "get_ml_predictions": float(os.getenv("ML_TOOL_TIMEOUT", "40")),
+    # The first call also builds the population grid
+    "propose_new_stops": float(os.getenv("OPTIMIZER_TOOL_TIMEOUT", "30")),
+}
+
 # System instruction for the agent
 SYSTEM_INSTRUCTION = """You are an AI assistant helping Dubai's Roads and Transport Authority (RTA) with city planning and public transport optimization.
 
@@ -40,7 +30,8 @@ SYSTEM_INSTRUCTION = """You are an AI assistant helping Dubai's Roads and Transp
 1. **ML Predictions**: Use the get_ml_predictions tool to get traffic and transport predictions for specific coordinates
 2. **Transport Analysis**: Use analyze_transport_coverage to assess public transport in named areas
 3. **Area Statistics**: Use get_area_statistics for comprehensive data about selected map regions
-4. **Web Search**: Use google_search to find real-time information about Dubai transport, news, and regulations
+4. **Stop Placement**: Use propose_new_stops to find where new stops would bring the most unserved residents within walking distance
+5. **Web Search**: Use google_search to find real-time information about Dubai transport, news, and regulations
 
 ## Context:
 - You are working with Dubai city planners who want to improve public transport
@@ -53,6 +44,7 @@ SYSTEM_INSTRUCTION = """You are an AI assistant helping Dubai's Roads and Transp
 - Provide data-driven recommendations when possible
 - Highlight areas needing improvement
 - Suggest specific actions the RTA can take
+- When recommending new stops, back the recommendation with propose_new_stops results
 - When coordinates are provided, always call the relevant analysis tools
 
 ## Dubai Transport Network Knowledge:
@@ -63,16 +55,52 @@ SYSTEM_INSTRUCTION = """You are an AI assistant helping Dubai's Roads and Transp
 - Future projects: Route 2020, Metro Blue Line
 """
 
-# Create the root agent
-root_agent = Agent(
-    name="dubai_rta_planner",
-    model=AGENT_MODEL,
-    description="AI assistant for Dubai RTA city planning and public transport optimization",
-    instruction=SYSTEM_INSTRUCTION,
-    tools=[
-        get_ml_predictions,
+@lru_cache(maxsize=1)
+def get_genai_client():
+    """Build the GenAI client on first use."""
+    # Ensure genai is configured (ADK might do this, but being explicit helps)
+    import google.genai as genai
+
+    return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+
+
+@lru_cache(maxsize=1)
+def get_root_agent():
+    """Create the root agent on first use."""
+    from google.adk.agents import Agent
+
+    from .tool_runtime import tool_runtime
+    from .tools import (
         analyze_transport_coverage,
         get_area_statistics,
-        # google_search  # Removed temporarily for debugging
-    ]
-)
+        get_ml_predictions,
+        propose_new_stops,
+        refresh_live_demand,
+    )
+
+    # Tools run through the runtime: timeout budgets, memoization and concurrent starts;
+    # live_demand is recomputed on every call so reused results never carry stale pings
+    return Agent(
+        name="dubai_rta_planner",
+        model=AGENT_MODEL,
+        description="AI assistant for Dubai RTA city planning and public transport optimization",
+        instruction=SYSTEM_INSTRUCTION,
+        tools=[
+            tool_runtime.wrap(
+                get_ml_predictions, timeout=TOOL_TIMEOUTS["get_ml_predictions"], refresh=refresh_live_demand
+            ),
+            tool_runtime.wrap(analyze_transport_coverage),
+            tool_runtime.wrap(get_area_statistics, refresh=refresh_live_demand),
+            tool_runtime.wrap(propose_new_stops, timeout=TOOL_TIMEOUTS["propose_new_stops"]),
+            # google_search  # Removed temporarily for debugging
+        ]
+    )
+
+
+def __getattr__(name: str):
+    # Module-level lazy attributes (PEP 562) keep `from .agent import root_agent` working
+    if name == "root_agent":
+        return get_root_agent()
+    if name == "client":
+        return get_genai_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
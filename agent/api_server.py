@@ -1,31 +1,54 @@
 """
 FastAPI Server for Dubai RTA City Planning Agent
 Exposes the agent functionality via REST API for frontend integration.
+
+Startup is kept cheap: the ADK runner and session service are built by a
+background warm-up task (or on first use), so /healthz answers immediately
+and /readyz reports when the agent can serve turns.
 """
+import asyncio
 import os
+from datetime import datetime
 from typing import Optional
 from contextlib import asynccontextmanager
-from pathlib import Path
+from uuid import UUID
 import hashlib
 import re
+import threading
+import time
 
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-
-# Load environment variables before importing agent
-# Ensure we load from agent/.env even when started from repo root.
-_agent_dir = Path(__file__).parent
-load_dotenv(_agent_dir / ".env")
-
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types as genai_types
-
-from .agent import root_agent
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+
+from .config import load_environment
+
+# Load environment variables before importing agent modules
+load_environment()
+
+from .admission import Overloaded, admission
+from .gazetteer import get_gazetteer
+from .metrics import (
+    ACTIVE_SESSIONS,
+    DEPENDENCY_ERRORS,
+    DEPENDENCY_LATENCY,
+    ERRORS_TOTAL,
+    INDEX_SCORE_TOTAL,
+    PING_BUFFER,
+    REQUEST_LATENCY,
+    REQUESTS_TOTAL,
+    SESSION_MESSAGES,
+    registry,
+)
+from .pings import ping_ingestor
+from .prefetch import prefetcher
+from .responses import CompressionMiddleware, FastJSONResponse, ndjson_response, wants_ndjson
 from .session_manager import session_manager
-from .tools import get_ml_predictions
+from .shared_state import run_store_call
+from .tool_runtime import tool_runtime
+from .tools import get_ml_predictions, propose_new_stops
+from .tracing import tracer
 
 
 # Pydantic models for API requests/responses
@@ -51,6 +74,27 @@ class ChatResponse(BaseModel):
     session_id: str
 
 
+class StopOptimizationRequest(BaseModel):
+    num_stops: int = Field(5, ge=1, le=50)
+    coverage_radius_m: float = Field(500.0, gt=0, le=5000)
+    north: Optional[float] = Field(None, ge=-90, le=90)
+    south: Optional[float] = Field(None, ge=-90, le=90)
+    east: Optional[float] = Field(None, ge=-180, le=180)
+    west: Optional[float] = Field(None, ge=-180, le=180)
+
+
+class PingIn(BaseModel):
+    device_id: UUID
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    accuracy_meters: Optional[float] = Field(None, ge=0)
+    ping_time: Optional[datetime] = None
+
+
+class PingBatch(BaseModel):
+    pings: list[PingIn] = Field(max_length=10000)
+
+
 class SessionResponse(BaseModel):
     id: str
     name: str
@@ -59,8 +103,49 @@ class SessionResponse(BaseModel):
     message_count: int
 
 
-# ADK Session service and Runner
-adk_session_service = InMemorySessionService()
+# ADK Session service and Runner, built lazily by _initialize_agent()
+adk_session_service = None
+adk_runner = None
+_init_lock = threading.Lock()
+
+
+def _initialize_agent():
+    """Import the ADK and build the session service and runner (idempotent)."""
+    global adk_session_service, adk_runner
+    with _init_lock:
+        if adk_runner is not None:
+            return adk_runner
+
+        from google.adk.runners import Runner
+        from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+
+        from .agent import get_root_agent
+
+        # With several workers, ADK conversation state must live in a shared database too
+        adk_db_url = os.getenv("ADK_SESSION_DB_URL")
+        if adk_db_url:
+            adk_session_service = DatabaseSessionService(db_url=adk_db_url)
+        else:
+            adk_session_service = InMemorySessionService()
+        adk_runner = Runner(
+            agent=get_root_agent(),
+            app_name="dubai_rta_planner",
+            session_service=adk_session_service
+        )
+        return adk_runner
+
+
+async def _warm_up(app: FastAPI):
+    """Build the agent off the event loop so health checks are served meanwhile."""
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(get_gazetteer)
+        await asyncio.to_thread(_initialize_agent)
+        app.state.ready = True
+        print(f"✅ Agent ready in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        app.state.init_error = str(e)
+        print(f"❌ Agent initialization failed: {e}")
 
 
 @asynccontextmanager
@@ -68,7 +153,15 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     print("🚀 Dubai RTA City Planning Agent starting...")
     print(f"📍 Using model: {os.getenv('AGENT_MODEL', 'gemini-2.0-flash')}")
+    app.state.ready = False
+    app.state.init_error = None
+    warm_up = asyncio.create_task(_warm_up(app))
+    ping_ingestor.start()
     yield
+    warm_up.cancel()
+    prefetcher.cancel_all()
+    # Write out buffered pings before exiting
+    await ping_ingestor.stop()
     print("👋 Agent shutting down...")
 
 
@@ -77,7 +170,8 @@ app = FastAPI(
     title="Dubai RTA City Planning Agent",
     description="AI-powered city planning assistant for Dubai RTA",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware for frontend integration
@@ -89,9 +183,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Large bodies (histories, traces, optimizer output, metrics) go out compressed
+app.add_middleware(CompressionMiddleware)
+
+# Session gauges are computed at scrape time so the hot path pays nothing
+ACTIVE_SESSIONS.set_function(session_manager.session_count)
+SESSION_MESSAGES.set_function(session_manager.message_count)
+PING_BUFFER.set_function(ping_ingestor.buffered)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency, status and error counts per route template."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Use the matched route template (e.g. /sessions/{session_id}) to bound label cardinality
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route_path)
+        REQUESTS_TOTAL.inc(method=request.method, route=route_path, status=str(status))
+        if status >= 500:
+            ERRORS_TOTAL.inc(route=route_path)
+
 
 async def run_agent(user_message: str, session_id: str) -> str:
     """Run the agent with a user message and return the response."""
+    from google.genai import types as genai_types
+
+    runner = adk_runner or await asyncio.to_thread(_initialize_agent)
+
     # Get or create ADK session
     adk_session = await adk_session_service.get_session(
         app_name="dubai_rta_planner",
@@ -106,13 +231,6 @@ async def run_agent(user_message: str, session_id: str) -> str:
             session_id=session_id
         )
     
-    # Create runner
-    runner = Runner(
-        agent=root_agent,
-        app_name="dubai_rta_planner",
-        session_service=adk_session_service
-    )
-    
     # Create proper Content object for the message
     content = genai_types.Content(
         role="user",
@@ -121,17 +239,49 @@ async def run_agent(user_message: str, session_id: str) -> str:
     
     # Run the agent and collect response
     response_parts = []
-    async for event in runner.run_async(
-        user_id="default_user",
-        session_id=session_id,
-        new_message=content
-    ):
-        # Check for final response content
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        response_parts.append(part.text)
+    trace = tracer.start_turn(session_id, user_message)
+    error = None
+    # Gemini latency covers only the gaps spent waiting on the model: from the
+    # request (or the last tool results) to the model's next event. Tool time
+    # between a function call and its response is not the model's.
+    model_wait_start = time.perf_counter()
+    try:
+        with tool_runtime.session(session_id), tracer.activate(trace):
+            async for event in runner.run_async(
+                user_id="default_user",
+                session_id=session_id,
+                new_message=content
+            ):
+                now = time.perf_counter()
+                if trace is not None:
+                    trace.record_event(event)
+                calls = event.get_function_calls()
+                if event.get_function_responses():
+                    model_wait_start = now
+                elif event.author != "user":
+                    if model_wait_start is not None:
+                        DEPENDENCY_LATENCY.observe(now - model_wait_start, dependency="gemini")
+                    model_wait_start = None if calls or event.is_final_response() else now
+                # Start all tool calls of this model response now, so ADK finds them in flight
+                if len(calls) > 1:
+                    tool_runtime.start_calls(calls)
+                # Check for final response content
+                if event.is_final_response():
+                    if event.content and event.content.parts:
+                        for part in event.content.parts:
+                            if hasattr(part, 'text') and part.text:
+                                response_parts.append(part.text)
+    except Exception as e:
+        # Failures while tools were running are tool errors, not Gemini's
+        if model_wait_start is not None:
+            DEPENDENCY_LATENCY.observe(time.perf_counter() - model_wait_start, dependency="gemini")
+            DEPENDENCY_ERRORS.inc(dependency="gemini")
+        error = str(e)
+        raise
+    finally:
+        if trace is not None:
+            trace.finish(error=error)
+            await asyncio.to_thread(tracer.export, trace)
     
     return "".join(response_parts) if response_parts else "I apologize, but I couldn't generate a response. Please try again."
 
@@ -141,9 +291,13 @@ def _deterministic_score(seed: str) -> int:
     return int.from_bytes(digest[:2], "big") % 101
 
 
+# Accept patterns like: "25.2048, 55.2708" or "lat 25.2048 lng 55.2708"
+_LAT_LNG_PAIR_RE = re.compile(r"(-?\d{1,3}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)")
+_LAT_LNG_LABELLED_RE = re.compile(r"lat\s*[:=]?\s*(-?\d{1,3}\.\d+).*?lng\s*[:=]?\s*(-?\d{1,3}\.\d+)", re.IGNORECASE)
+
+
 def _extract_lat_lng_from_text(text: str) -> Optional[tuple[float, float]]:
-    # Accept patterns like: "25.2048, 55.2708" or "lat 25.2048 lng 55.2708"
-    match = re.search(r"(-?\d{1,3}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)", text)
+    match = _LAT_LNG_PAIR_RE.search(text)
     if match:
         try:
             a = float(match.group(1))
@@ -154,13 +308,18 @@ def _extract_lat_lng_from_text(text: str) -> Optional[tuple[float, float]]:
         except ValueError:
             return None
 
-    match = re.search(r"lat\s*[:=]?\s*(-?\d{1,3}\.\d+).*?lng\s*[:=]?\s*(-?\d{1,3}\.\d+)", text, re.IGNORECASE)
+    match = _LAT_LNG_LABELLED_RE.search(text)
     if match:
         try:
             return (float(match.group(1)), float(match.group(2)))
         except ValueError:
             return None
 
+    # Fall back to named places ("Dubai Marina", "القصيص") from the gazetteer
+    place = get_gazetteer().resolve(text)
+    if place:
+        return (place.latitude, place.longitude)
+
     return None
 
 
@@ -179,7 +338,8 @@ async def generate_index_score(
     lng = longitude
 
     if lat is None or lng is None:
-        extracted = _extract_lat_lng_from_text(message)
+        # May build the gazetteer if warm-up hasn't finished; keep that off the event loop
+        extracted = await asyncio.to_thread(_extract_lat_lng_from_text, message)
         if extracted:
             lat, lng = extracted
 
@@ -200,13 +360,16 @@ async def generate_index_score(
                 score_val = float(_deterministic_score(f"ml:{lat:.5f}:{lng:.5f}:{radius_km:.2f}"))
 
             score_int = max(0, min(100, int(round(score_val))))
+            INDEX_SCORE_TOTAL.inc(source="ml", reason="ok")
             return f"Index score: {score_int} (ML model)"
 
         # Fallback estimate when ML service is down or returns errors.
+        INDEX_SCORE_TOTAL.inc(source="estimated", reason="ml_unavailable")
         score_int = _deterministic_score(f"fallback:{lat:.5f}:{lng:.5f}:{radius_km:.2f}")
         return f"Index score: {score_int} (estimated)"
 
     # No coordinates; still return a score without asking follow-ups.
+    INDEX_SCORE_TOTAL.inc(source="estimated", reason="no_coordinates")
     score_int = _deterministic_score(f"text:{message}")
     return f"Index score: {score_int} (estimated)"
 
@@ -221,6 +384,39 @@ async def root():
     }
 
 
+@app.get("/healthz")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: the agent runner has been initialized."""
+    if getattr(app.state, "ready", False):
+        return {"status": "ready"}
+    return JSONResponse(
+        status_code=503,
+        content={"status": "starting", "error": getattr(app.state, "init_error", None)}
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics in text exposition format."""
+    # Session gauges query the state store while rendering
+    return PlainTextResponse(await run_store_call(registry.render), media_type=registry.CONTENT_TYPE)
+
+
+def _overloaded_response(error: Overloaded) -> HTTPException:
+    """Fast 429 telling the client when to retry."""
+    return HTTPException(
+        status_code=429,
+        detail=f"Server busy ({error.reason}); please retry shortly",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
@@ -228,23 +424,28 @@ async def chat(request: ChatRequest):
     Creates a new session if session_id is not provided.
     """
     # Get or create our session
-    session = session_manager.get_or_create_session(request.session_id)
-    
-    # Add user message to history
-    session.add_message("user", request.message)
+    session = await run_store_call(session_manager.get_or_create_session, request.session_id)
     
     try:
-        response = await generate_index_score(request.message)
-        
-        # Add assistant response to history
-        session.add_message("assistant", response)
-        
-        return ChatResponse(
-            response=response,
-            session_id=session.id
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+        # One turn per session at a time, and a bounded number of turns overall
+        async with admission.turn(session.id):
+            # Add user message to history
+            await run_store_call(session_manager.add_message, session.id, "user", request.message)
+            
+            try:
+                response = await generate_index_score(request.message)
+                
+                # Add assistant response to history
+                await run_store_call(session_manager.add_message, session.id, "assistant", response)
+                
+                return ChatResponse(
+                    response=response,
+                    session_id=session.id
+                )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+    except Overloaded as e:
+        raise _overloaded_response(e)
 
 
 @app.post("/chat/coordinates", response_model=ChatResponse)
@@ -254,74 +455,147 @@ async def chat_with_coordinates(request: CoordinateChatRequest):
     The coordinates will be included in the context.
     """
     # Get or create session
-    session = session_manager.get_or_create_session(request.session_id)
-    
-    # Update session context with coordinates
-    session_manager.update_session_context(session.id, {
-        "selected_coordinates": {
-            "lat": request.latitude,
-            "lng": request.longitude,
-            "radius_km": request.radius_km
-        }
-    })
-    
-    # Enhance message with coordinate context
-    enhanced_message = (
-        f"{request.message}\n\n"
-        f"[Map Selection: Coordinates ({request.latitude}, {request.longitude}) "
-        f"with radius {request.radius_km}km]"
-    )
+    session = await run_store_call(session_manager.get_or_create_session, request.session_id)
+    # The planner moved on; stop warming around the previous selection
+    prefetcher.cancel(session.id)
     
-    # Add to history with coordinates
-    session.add_message(
-        "user",
-        request.message,
-        coordinates={
-            "lat": request.latitude,
-            "lng": request.longitude,
-            "radius_km": request.radius_km
-        }
-    )
+    try:
+        async with admission.turn(session.id):
+            # Update session context with coordinates
+            await run_store_call(session_manager.update_session_context, session.id, {
+                "selected_coordinates": {
+                    "lat": request.latitude,
+                    "lng": request.longitude,
+                    "radius_km": request.radius_km
+                }
+            })
+            
+            # Enhance message with coordinate context
+            enhanced_message = (
+                f"{request.message}\n\n"
+                f"[Map Selection: Coordinates ({request.latitude}, {request.longitude}) "
+                f"with radius {request.radius_km}km]"
+            )
+            
+            # Add to history with coordinates
+            await run_store_call(
+                session_manager.add_message,
+                session.id,
+                "user",
+                request.message,
+                coordinates={
+                    "lat": request.latitude,
+                    "lng": request.longitude,
+                    "radius_km": request.radius_km
+                }
+            )
+            
+            try:
+                response = await generate_index_score(
+                    request.message,
+                    latitude=request.latitude,
+                    longitude=request.longitude,
+                    radius_km=request.radius_km or 1.0,
+                )
+                
+                # Add response to history
+                await run_store_call(session_manager.add_message, session.id, "assistant", response)
+                
+                # Warm neighbouring cells and radii for the likely next click
+                prefetcher.schedule(
+                    session.id,
+                    request.latitude,
+                    request.longitude,
+                    request.radius_km or 1.0
+                )
+                
+                return ChatResponse(
+                    response=response,
+                    session_id=session.id
+                )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+    except Overloaded as e:
+        raise _overloaded_response(e)
+
+
+@app.post("/optimize/stops")
+async def optimize_stops(request: StopOptimizationRequest):
+    """
+    Propose new stop locations that cover the most currently unserved population.
+    Optionally limited to a north/south/east/west bounding box.
+    """
+    box = {"north": request.north, "south": request.south, "east": request.east, "west": request.west}
+    bounds = None
+    if any(v is not None for v in box.values()):
+        if any(v is None for v in box.values()):
+            raise HTTPException(status_code=400, detail="Bounds need all of north, south, east and west")
+        bounds = box
     
     try:
-        response = await generate_index_score(
-            request.message,
-            latitude=request.latitude,
-            longitude=request.longitude,
-            radius_km=request.radius_km or 1.0,
-        )
-        
-        # Add response to history
-        session.add_message("assistant", response)
-        
-        return ChatResponse(
-            response=response,
-            session_id=session.id
+        # CPU-bound work shares the turn slots so it can't starve chat traffic
+        async with admission.slot():
+            result = await propose_new_stops(
+                num_stops=request.num_stops,
+                coverage_radius_m=request.coverage_radius_m,
+                bounds=bounds
+            )
+    except Overloaded as e:
+        raise _overloaded_response(e)
+    
+    if result.get("status") == "invalid_request":
+        raise HTTPException(status_code=400, detail=result["error"])
+    if result.get("status") == "unavailable":
+        raise HTTPException(status_code=503, detail=result["error"])
+    if result.get("status") == "error":
+        raise HTTPException(status_code=500, detail=result["error"])
+    return FastJSONResponse(result)
+
+
+@app.post("/pings", status_code=202)
+async def ingest_pings(batch: PingBatch):
+    """
+    Accept a batch of commuter pings.
+    Pings count toward live demand immediately and are written to the database in bulk.
+    """
+    received_at = time.time()
+    rows = [
+        (
+            str(p.device_id),
+            p.latitude,
+            p.longitude,
+            p.accuracy_meters,
+            p.ping_time.timestamp() if p.ping_time else received_at
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+        for p in batch.pings
+    ]
+    try:
+        accepted = ping_ingestor.submit(rows)
+    except Overloaded as e:
+        raise _overloaded_response(e)
+    return {"status": "accepted", "accepted": accepted, "buffered": ping_ingestor.buffered()}
+
+
+# Fields of SessionResponse; the summaries are built server-side, so they're projected, not re-validated
+_SESSION_FIELDS = ("id", "name", "created_at", "updated_at", "message_count")
 
 
 @app.get("/sessions", response_model=list[SessionResponse])
-async def list_sessions():
-    """List all chat sessions."""
-    sessions = session_manager.list_sessions()
-    return [
-        SessionResponse(
-            id=s["id"],
-            name=s["name"],
-            created_at=s["created_at"],
-            updated_at=s["updated_at"],
-            message_count=s["message_count"]
-        )
-        for s in sessions
+async def list_sessions(request: Request):
+    """List all chat sessions (NDJSON with `Accept: application/x-ndjson` or `?format=ndjson`)."""
+    sessions = [
+        {field: s[field] for field in _SESSION_FIELDS}
+        for s in await run_store_call(session_manager.list_sessions)
     ]
+    if wants_ndjson(request):
+        return ndjson_response(sessions)
+    return FastJSONResponse(sessions)
 
 
 @app.post("/sessions", response_model=SessionResponse)
 async def create_session(request: CreateSessionRequest):
     """Create a new chat session."""
-    session = session_manager.create_session(request.name)
+    session = await run_store_call(session_manager.create_session, request.name)
     return SessionResponse(
         id=session.id,
         name=session.name,
@@ -334,30 +608,44 @@ async def create_session(request: CreateSessionRequest):
 @app.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """Delete a chat session."""
-    if session_manager.delete_session(session_id):
+    tool_runtime.forget_session(session_id)
+    prefetcher.cancel(session_id)
+    if await run_store_call(session_manager.delete_session, session_id):
         return {"status": "deleted", "session_id": session_id}
     raise HTTPException(status_code=404, detail="Session not found")
 
 
 @app.get("/sessions/{session_id}/history")
-async def get_session_history(session_id: str):
-    """Get the message history for a session."""
-    session = session_manager.get_session(session_id)
+async def get_session_history(session_id: str, request: Request):
+    """Get the message history for a session (NDJSON, one message per line, on request)."""
+    session = await run_store_call(session_manager.get_session, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return {
+    # Timestamps stay datetimes; the encoder writes them as ISO 8601
+    messages = (
+        {
+            "role": msg.role,
+            "content": msg.content,
+            "timestamp": msg.timestamp,
+            "coordinates": msg.coordinates
+        }
+        for msg in session.messages
+    )
+    if wants_ndjson(request):
+        return ndjson_response(messages, headers={"X-Session-Id": session_id})
+    return FastJSONResponse({"session_id": session_id, "messages": list(messages)})
+
+
+@app.get("/debug/traces/{session_id}")
+async def get_session_traces(session_id: str, limit: int = Query(20, ge=1, le=500)):
+    """Get the most recent recorded agent turn traces for a session."""
+    if not tracer.enabled:
+        raise HTTPException(status_code=404, detail="Tracing is disabled (set AGENT_TRACE_SAMPLE_RATE)")
+    return FastJSONResponse({
         "session_id": session_id,
-        "messages": [
-            {
-                "role": msg.role,
-                "content": msg.content,
-                "timestamp": msg.timestamp.isoformat(),
-                "coordinates": msg.coordinates
-            }
-            for msg in session.messages
-        ]
-    }
+        "traces": await asyncio.to_thread(tracer.read_traces, session_id, limit)
+    })
 
 
 # Entry point for running with uvicorn
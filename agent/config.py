@@ -0,0 +1,30 @@
+"""
+Environment Configuration for the Dubai RTA Agent
+Loads agent/.env exactly once, no matter how many modules ask for it.
+"""
+import os
+from functools import lru_cache
+from pathlib import Path
+
+_agent_dir = Path(__file__).parent
+
+
+@lru_cache(maxsize=1)
+def load_environment() -> None:
+    """Load agent/.env and prefer the Gemini API key over cloud credentials."""
+    # Imported here so modules that only need the flag pay nothing after the first call
+    from dotenv import load_dotenv
+
+    # Ensure we load from agent/.env even when started from repo root.
+    load_dotenv(_agent_dir / ".env")
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if api_key:
+        print(f"🔑 Loaded Google API Key: {api_key[:8]}...{api_key[-4:]}")
+        # Force ADK/GenAI to use this key and ignore potentially stale cloud credentials
+        os.environ["GENAI_API_KEY"] = api_key
+        if "GOOGLE_APPLICATION_CREDENTIALS" in os.environ:
+            print("⚠️  Warning: GOOGLE_APPLICATION_CREDENTIALS found. Unsetting to prefer API Key.")
+            del os.environ["GOOGLE_APPLICATION_CREDENTIALS"]
+    else:
+        print("❌ Google API Key NOT found in environment!")
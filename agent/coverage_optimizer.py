@@ -0,0 +1,298 @@
+"""
+Coverage-Gap Optimizer
+Proposes new stop locations that bring the most unserved residents within walking distance.
+
+Community populations from data/dubai.geojson are spread over a regular grid of
+population cells inside each polygon. Cells within the coverage radius of an
+existing stop (data/Public_Transportation_Routes_Stops.csv) count as served. For a
+grid of candidate sites, a sparse candidate x cell coverage matrix is built with a
+KD-tree, and K sites are picked by lazy-greedy maximum coverage: marginal gains only
+shrink as cells get covered, so a stale gain that still tops the heap is exact.
+"""
+import csv
+import heapq
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from .gazetteer import DATA_DIR
+
+COVERAGE_RADIUS_M = float(os.getenv("COVERAGE_RADIUS_M", "500"))
+POPULATION_CELL_M = float(os.getenv("COVERAGE_POPULATION_CELL_M", "250"))
+CANDIDATE_SPACING_M = float(os.getenv("COVERAGE_CANDIDATE_SPACING_M", "400"))
+MAX_NEW_STOPS = 50
+# Upper bound on candidate sites per run (~1 s of KD-tree queries at the default radius)
+MAX_CANDIDATES = int(os.getenv("COVERAGE_MAX_CANDIDATES", "600000"))
+
+# Local equirectangular projection; distortion across the emirate is well under 1%
+_EARTH_RADIUS_M = 6_371_000.0
+_REF_LAT = math.radians(25.1)
+_M_PER_DEG_LAT = math.radians(1) * _EARTH_RADIUS_M
+_M_PER_DEG_LNG = _M_PER_DEG_LAT * math.cos(_REF_LAT)
+
+
+def to_xy(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Degrees -> metres on the local plane, as an (n, 2) array."""
+    return np.column_stack((np.asarray(lng) * _M_PER_DEG_LNG, np.asarray(lat) * _M_PER_DEG_LAT))
+
+
+def to_lat_lng(xy: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    return xy[:, 1] / _M_PER_DEG_LAT, xy[:, 0] / _M_PER_DEG_LNG
+
+
+def points_in_rings(points: np.ndarray, rings: list[np.ndarray]) -> np.ndarray:
+    """Even-odd point-in-polygon test over all rings at once (holes included)."""
+    inside = np.zeros(len(points), dtype=bool)
+    px, py = points[:, 0:1], points[:, 1:2]
+    for ring in rings:
+        x1, y1 = ring[:-1, 0], ring[:-1, 1]
+        x2, y2 = ring[1:, 0], ring[1:, 1]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        crossings = np.count_nonzero(straddles & (px < x_cross), axis=1)
+        inside ^= (crossings % 2).astype(bool)
+    return inside
+
+
+@dataclass
+class CoverageModel:
+    """Population cells and existing stops, projected to metres."""
+    cell_xy: np.ndarray
+    cell_population: np.ndarray
+    cell_community: np.ndarray  # index into community_names
+    community_names: list[str]
+    stop_tree: cKDTree
+    stop_count: int
+
+    @property
+    def total_population(self) -> float:
+        return float(self.cell_population.sum())
+
+
+def _load_population_cells(path: Path, cell_m: float):
+    with open(path, "r", encoding="utf-8") as f:
+        features = json.load(f)["features"]
+
+    cells, weights, communities, names = [], [], [], []
+    for feature in features:
+        props = feature["properties"]
+        population = props.get("Population 2019") or props.get("Population 2018") or 0
+        geometry = feature.get("geometry") or {}
+        if population <= 0 or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+        rings = [
+            to_xy(np.asarray(ring)[:, 1], np.asarray(ring)[:, 0])
+            for polygon in polygons for ring in polygon
+        ]
+
+        stacked = np.vstack(rings)
+        (min_x, min_y), (max_x, max_y) = stacked.min(axis=0), stacked.max(axis=0)
+        gx, gy = np.meshgrid(
+            np.arange(min_x + cell_m / 2, max_x, cell_m),
+            np.arange(min_y + cell_m / 2, max_y, cell_m),
+        )
+        grid = np.column_stack((gx.ravel(), gy.ravel()))
+        grid = grid[points_in_rings(grid, rings)] if len(grid) else grid
+        if not len(grid):
+            # Community smaller than one cell: a single cell at its centroid
+            grid = stacked.mean(axis=0, keepdims=True)
+
+        community_index = len(names)
+        names.append((props.get("CNAME_E") or props.get("COMM_NUM") or "").strip())
+        cells.append(grid)
+        weights.append(np.full(len(grid), population / len(grid)))
+        communities.append(np.full(len(grid), community_index))
+
+    return np.vstack(cells), np.concatenate(weights), np.concatenate(communities), names
+
+
+def _load_stop_xy(path: Path) -> np.ndarray:
+    coords = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                coords[row["stop_id"]] = (float(row["stop_location_latitude"]), float(row["stop_location_longitude"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+    if not coords:
+        return np.empty((0, 2))
+    lat_lng = np.asarray(list(coords.values()))
+    return to_xy(lat_lng[:, 0], lat_lng[:, 1])
+
+
+def build_coverage_model(data_dir: Path = DATA_DIR, cell_m: float = POPULATION_CELL_M) -> CoverageModel:
+    """Build the population grid and the stop index from the data files."""
+    cell_xy, cell_population, cell_community, names = _load_population_cells(data_dir / "dubai.geojson", cell_m)
+    stops_path = data_dir / "Public_Transportation_Routes_Stops.csv"
+    stop_xy = _load_stop_xy(stops_path) if stops_path.exists() else np.empty((0, 2))
+    return CoverageModel(
+        cell_xy=cell_xy,
+        cell_population=cell_population,
+        cell_community=cell_community,
+        community_names=names,
+        stop_tree=cKDTree(stop_xy),
+        stop_count=len(stop_xy),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_coverage_model() -> CoverageModel:
+    """Return the process-wide coverage model, building it on first use."""
+    return build_coverage_model()
+
+
+def coverage_matrix(candidate_xy: np.ndarray, cell_xy: np.ndarray, radius_m: float) -> sparse.csr_matrix:
+    """Boolean candidate x cell matrix; entry (i, j) is set when cell j is within radius of candidate i."""
+    neighbours = cKDTree(cell_xy).query_ball_point(candidate_xy, radius_m)
+    lengths = np.fromiter((len(n) for n in neighbours), dtype=np.int64, count=len(neighbours))
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    indices = np.fromiter((j for n in neighbours for j in n), dtype=np.int64, count=int(indptr[-1]))
+    data = np.ones(len(indices), dtype=bool)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(candidate_xy), len(cell_xy)))
+
+
+def lazy_greedy(matrix: sparse.csr_matrix, weights: np.ndarray, k: int) -> list[tuple[int, float]]:
+    """Pick up to k rows maximizing the total weight of covered columns; returns (row, gain) pairs."""
+    indptr, indices = matrix.indptr, matrix.indices
+    covered = np.zeros(matrix.shape[1], dtype=bool)
+    gains = matrix @ weights
+    heap = [(-gain, row) for row, gain in enumerate(gains) if gain > 0]
+    heapq.heapify(heap)
+
+    selected = []
+    while heap and len(selected) < k:
+        _, row = heapq.heappop(heap)
+        cols = indices[indptr[row]:indptr[row + 1]]
+        gain = float(weights[cols][~covered[cols]].sum())
+        if gain <= 0:
+            continue
+        # Gains only decrease, so beating the next stale bound means beating every exact gain
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, row))
+            continue
+        covered[cols] = True
+        selected.append((row, gain))
+    return selected
+
+
+def validate_bounds(bounds: dict) -> tuple[float, float, float, float]:
+    """Return (south, west, north, east), raising ValueError for a malformed box."""
+    try:
+        south, west = float(bounds["south"]), float(bounds["west"])
+        north, east = float(bounds["north"]), float(bounds["east"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Bounds need numeric north, south, east and west")
+    if not (-90 <= south < north <= 90):
+        raise ValueError("Bounds need -90 <= south < north <= 90")
+    if not (-180 <= west < east <= 180):
+        raise ValueError("Bounds need -180 <= west < east <= 180")
+    return south, west, north, east
+
+
+def propose_stops(
+    k: int = 5,
+    radius_m: float = COVERAGE_RADIUS_M,
+    bounds: Optional[dict] = None,
+    candidate_spacing_m: float = CANDIDATE_SPACING_M,
+) -> dict:
+    """
+    Choose k new stop sites that cover the most currently unserved population.
+
+    Args:
+        k: Number of stops to place
+        radius_m: Walking distance a stop covers, in metres
+        bounds: Optional 'north', 'south', 'east', 'west' box to restrict candidate sites to
+        candidate_spacing_m: Spacing of the candidate site grid, in metres
+
+    Returns:
+        Dictionary with the proposed sites and coverage before and after
+
+    Raises:
+        ValueError: for malformed bounds or a candidate grid above MAX_CANDIDATES
+    """
+    start = time.perf_counter()
+    box = validate_bounds(bounds) if bounds else None
+    if not (0 < radius_m <= 5000) or candidate_spacing_m <= 0:
+        raise ValueError("Coverage radius must be in (0, 5000] m and candidate spacing positive")
+    model = get_coverage_model()
+    k = max(1, min(int(k), MAX_NEW_STOPS))
+
+    served = np.zeros(len(model.cell_xy), dtype=bool)
+    if model.stop_count:
+        nearest, _ = model.stop_tree.query(model.cell_xy, distance_upper_bound=radius_m)
+        served = np.isfinite(nearest)
+    unserved_xy = model.cell_xy[~served]
+    unserved_population = model.cell_population[~served]
+    unserved_community = model.cell_community[~served]
+
+    # Candidate sites on a regular grid around the unserved cells
+    # Candidates further than radius_m from every unserved cell cover nothing
+    candidate_xy, matrix, selected = np.empty((0, 2)), None, []
+    if len(unserved_xy):
+        min_x, min_y = unserved_xy.min(axis=0) - radius_m
+        max_x, max_y = unserved_xy.max(axis=0) + radius_m
+        if box:
+            (box_min_x, box_min_y), (box_max_x, box_max_y) = to_xy(
+                np.array([box[0], box[2]]), np.array([box[1], box[3]])
+            )
+            min_x, min_y = max(min_x, box_min_x), max(min_y, box_min_y)
+            max_x, max_y = min(max_x, box_max_x), min(max_y, box_max_y)
+        if min_x <= max_x and min_y <= max_y:
+            n_x = int((max_x - min_x) // candidate_spacing_m) + 1
+            n_y = int((max_y - min_y) // candidate_spacing_m) + 1
+            if n_x * n_y > MAX_CANDIDATES:
+                raise ValueError(
+                    f"{n_x * n_y} candidate sites exceed the limit of {MAX_CANDIDATES}; "
+                    "use a smaller area or a larger candidate spacing"
+                )
+            gx, gy = np.meshgrid(
+                min_x + np.arange(n_x) * candidate_spacing_m,
+                min_y + np.arange(n_y) * candidate_spacing_m,
+            )
+            candidate_xy = np.column_stack((gx.ravel(), gy.ravel()))
+            matrix = coverage_matrix(candidate_xy, unserved_xy, radius_m)
+            selected = lazy_greedy(matrix, unserved_population, k)
+
+    total = model.total_population
+    covered_now = float(model.cell_population[served].sum())
+    proposals, cumulative = [], 0.0
+    if selected:
+        rows = np.array([row for row, _ in selected])
+        lats, lngs = to_lat_lng(candidate_xy[rows])
+        for rank, ((row, gain), lat, lng) in enumerate(zip(selected, lats, lngs), start=1):
+            cumulative += gain
+            cols = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+            community = np.bincount(unserved_community[cols], weights=unserved_population[cols]).argmax()
+            proposals.append({
+                "rank": rank,
+                "latitude": round(float(lat), 6),
+                "longitude": round(float(lng), 6),
+                "community": model.community_names[community],
+                "new_population_covered": round(gain),
+                "cumulative_population_covered": round(cumulative),
+            })
+
+    return {
+        "status": "success",
+        "proposed_stops": proposals,
+        "coverage_radius_m": radius_m,
+        "population_total": round(total),
+        "population_covered_before": round(covered_now),
+        "population_covered_after": round(covered_now + cumulative),
+        "coverage_pct_before": round(100 * covered_now / total, 2) if total else 0.0,
+        "coverage_pct_after": round(100 * (covered_now + cumulative) / total, 2) if total else 0.0,
+        "candidates_evaluated": len(candidate_xy),
+        "existing_stops": model.stop_count,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
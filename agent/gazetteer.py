@@ -0,0 +1,285 @@
+"""
+Dubai Place-Name Gazetteer
+Resolves English and Arabic place names in free text to coordinates without a model call.
+
+Names come from the community polygons in data/dubai.geojson (CNAME_E / CNAME_A)
+and the stop names in data/Public_Transportation_Routes_Stops.csv. They are compiled
+into an Aho-Corasick automaton, so every name in a message is found in one linear scan.
+
+Stop names are noisier than community names: a stop called "Max" or "Creek" would
+otherwise match ordinary words in a question. A stop-derived name made up only of
+generic words (_GENERIC_STOP_WORDS) is therefore not indexed.
+"""
+import csv
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+_repo_dir = Path(__file__).parent.parent
+DATA_DIR = Path(os.getenv("AGENT_DATA_DIR", str(_repo_dir / "data")))
+
+# Official community names often differ from what planners type
+ALIASES = {
+    "dubai marina": "MARSA DUBAI",
+    "jbr": "MARSA DUBAI",
+    "downtown dubai": "BURJ KHALIFA",
+    "palm jumeirah": "NAKHLAT JUMEIRA",
+    "jumeirah village circle": "AL BARSHA SOUTH FOURTH",
+    "jvc": "AL BARSHA SOUTH FOURTH",
+}
+
+# Trailing ordinals are dropped to derive group names ("AL QUSAIS FIRST" -> "AL QUSAIS")
+_ORDINALS = {
+    "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth",
+    "الاولي", "الثانيه", "الثالثه", "الرابعه", "الخامسه", "السادسه", "السابعه", "الثامنه", "التاسعه",
+}
+
+_ARABIC_DIACRITICS = re.compile(r"[\u064B-\u0652\u0670\u0640]")
+_ARABIC_FOLD = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ة": "ه", "ى": "ي"})
+_NON_WORD = re.compile(r"[^\w]+|_")
+_TRAILING_NUMBER = re.compile(r"(?: \d+)+$")
+
+# Everyday words that also appear as (or in) stop names; a stop-derived name made
+# only of these is too ambiguous to resolve a message to that stop
+_GENERIC_STOP_WORDS = {
+    "the", "max", "dip", "creek", "expo", "emirates", "interchange", "stadium",
+    "center", "centre", "lease", "offices", "technical", "school", "executive", "court",
+    "villas", "complex", "rehabilitation", "beach", "marine", "airport", "terminal",
+    "road", "street", "station", "bus", "metro", "park", "mall", "market", "hospital",
+    "clinic", "plaza", "garden", "gardens", "hotel", "entrance", "junction", "depot",
+}
+
+# Priority when two sources produce the same name
+_KIND_RANK = {"community": 0, "alias": 1, "community_group": 2, "stop": 3}
+
+
+@dataclass(frozen=True)
+class Place:
+    """A resolved place name with its centroid."""
+    name: str
+    kind: str  # 'community', 'community_group', 'alias' or 'stop'
+    latitude: float
+    longitude: float
+    comm_num: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class PlaceMatch:
+    """A place found in a piece of text, with its character span in the normalized text."""
+    place: Place
+    start: int
+    end: int
+
+
+def normalize(text: str) -> str:
+    """Casefold, fold Arabic letter variants and collapse punctuation to single spaces."""
+    text = _ARABIC_DIACRITICS.sub("", text.casefold()).translate(_ARABIC_FOLD)
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over characters; finds all patterns in one pass."""
+
+    def __init__(self):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+        self._patterns: list[str] = []
+
+    def add(self, pattern: str) -> int:
+        """Add a pattern and return its id."""
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        pattern_id = len(self._patterns)
+        self._patterns.append(pattern)
+        self._out[node].append(pattern_id)
+        return pattern_id
+
+    def build(self) -> None:
+        """Compute failure links breadth-first."""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterable[tuple[int, int, int]]:
+        """Yield (start, end, pattern_id) for every occurrence in text."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern_id in out[node]:
+                yield index + 1 - len(patterns[pattern_id]), index + 1, pattern_id
+
+
+class Gazetteer:
+    """Place-name index over Dubai communities and transit stops."""
+
+    def __init__(self, places: dict[str, Place]):
+        self._matcher = AhoCorasick()
+        self._places: list[Place] = []
+        for name, place in places.items():
+            # Space padding makes every match respect word boundaries
+            self._matcher.add(f" {name} ")
+            self._places.append(place)
+        self._matcher.build()
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def find(self, text: str) -> list[PlaceMatch]:
+        """All non-overlapping place names in text, leftmost-longest first."""
+        padded = f" {normalize(text)} "
+        candidates = sorted(
+            self._matcher.iter_matches(padded),
+            key=lambda m: (m[0], -(m[1] - m[0])),
+        )
+        matches = []
+        last_end = 0
+        for start, end, pattern_id in candidates:
+            # Adjacent matches share their padding space, hence start + 1
+            if start + 1 < last_end:
+                continue
+            matches.append(PlaceMatch(self._places[pattern_id], start, end - 2))
+            last_end = end
+        return matches
+
+    def resolve(self, text: str) -> Optional[Place]:
+        """The best place mentioned in text: the longest name, then the earliest."""
+        matches = self.find(text)
+        if not matches:
+            return None
+        return max(matches, key=lambda m: (m.end - m.start, -m.start)).place
+
+
+def _add_place(places: dict[str, Place], name: str, place: Place) -> None:
+    key = normalize(name)
+    if len(key) < 3:
+        return
+    existing = places.get(key)
+    if existing is None or _KIND_RANK[place.kind] < _KIND_RANK[existing.kind]:
+        places[key] = place
+
+
+def _mean_place(name: str, kind: str, members: list[tuple[float, float]]) -> Place:
+    return Place(
+        name=name,
+        kind=kind,
+        latitude=sum(lat for lat, _ in members) / len(members),
+        longitude=sum(lng for _, lng in members) / len(members),
+    )
+
+
+def _load_communities(places: dict[str, Place], path: Path) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        features = json.load(f)["features"]
+
+    by_cname: dict[str, Place] = {}
+    groups: dict[str, list[tuple[float, float]]] = defaultdict(list)
+    for feature in features:
+        props = feature["properties"]
+        if props.get("Latitude") is None or props.get("Longitude") is None:
+            continue
+        lat, lng = float(props["Latitude"]), float(props["Longitude"])
+        for name in (props.get("CNAME_E"), props.get("CNAME_A")):
+            if not name:
+                continue
+            place = Place(name.strip(), "community", lat, lng, comm_num=props.get("COMM_NUM"))
+            _add_place(places, name, place)
+            by_cname[name.strip().upper()] = place
+            words = normalize(name).split()
+            if len(words) > 1 and words[-1] in _ORDINALS:
+                groups[" ".join(words[:-1])].append((lat, lng))
+
+    for group_name, members in groups.items():
+        _add_place(places, group_name, _mean_place(group_name, "community_group", members))
+
+    for alias, cname in ALIASES.items():
+        target = by_cname.get(cname)
+        if target is not None:
+            _add_place(places, alias, Place(alias, "alias", target.latitude, target.longitude, target.comm_num))
+
+
+def _load_stops(places: dict[str, Place], path: Path) -> None:
+    stops: dict[str, list[tuple[float, float]]] = defaultdict(list)
+    seen_ids = set()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            stop_id = row.get("stop_id")
+            if stop_id in seen_ids:
+                continue
+            seen_ids.add(stop_id)
+            try:
+                lat = float(row["stop_location_latitude"])
+                lng = float(row["stop_location_longitude"])
+            except (TypeError, ValueError):
+                continue
+            name = normalize(row.get("stop_name") or "")
+            if not name:
+                continue
+            stops[name].append((lat, lng))
+            # "Al Qusais, Bus Station 1" and "Al Qusais 1" also name the area "Al Qusais"
+            area = normalize((row.get("stop_name") or "").split(",")[0])
+            base = _TRAILING_NUMBER.sub("", area)
+            for alias in {area, base} - {name}:
+                if alias:
+                    stops[alias].append((lat, lng))
+
+    for name, members in stops.items():
+        if set(name.split()) <= _GENERIC_STOP_WORDS:
+            continue
+        _add_place(places, name, _mean_place(name, "stop", members))
+
+
+def build_gazetteer(data_dir: Path = DATA_DIR) -> Gazetteer:
+    """Build the gazetteer from whichever data files are available."""
+    places: dict[str, Place] = {}
+    communities = data_dir / "dubai.geojson"
+    stops = data_dir / "Public_Transportation_Routes_Stops.csv"
+    if communities.exists():
+        _load_communities(places, communities)
+    if stops.exists():
+        _load_stops(places, stops)
+    return Gazetteer(places)
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer, building it once on first use (blocking)."""
+    global _gazetteer
+    if _gazetteer is not None:
+        return _gazetteer
+    # Concurrent first callers wait for one build instead of each running their own
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = build_gazetteer()
+        return _gazetteer
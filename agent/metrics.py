@@ -0,0 +1,290 @@
+"""
+Lightweight Prometheus Metrics for the Dubai RTA Agent
+Counters, gauges and histograms rendered in the Prometheus text exposition format.
+Kept dependency-free and lock-cheap so it can stay enabled in production.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+# Latency buckets in seconds, covering fast local routes up to slow LLM turns
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names: tuple, label_values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class holding the name, help text and label names of a metric."""
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback at scrape time."""
+    metric_type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], float]) -> None:
+        """Compute the (unlabelled) value lazily when metrics are scraped."""
+        self._callback = callback
+
+    def _samples(self) -> list[str]:
+        if self._callback is not None:
+            try:
+                return [f"{self.name} {_format_value(float(self._callback()))}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed histogram of observed values (seconds for latencies)."""
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Context manager observing the elapsed wall time of its body."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+                )
+            label_str = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all metrics and renders them for the /metrics endpoint."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the agent's metrics
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "agent_http_request_duration_seconds",
+    "HTTP request latency by route template and method.",
+    ("method", "route"),
+)
+REQUESTS_TOTAL = registry.counter(
+    "agent_http_requests_total",
+    "HTTP requests by route template, method and status code.",
+    ("method", "route", "status"),
+)
+DEPENDENCY_LATENCY = registry.histogram(
+    "agent_dependency_duration_seconds",
+    "Latency of outbound calls by dependency (ml_service, gemini).",
+    ("dependency",),
+)
+DEPENDENCY_ERRORS = registry.counter(
+    "agent_dependency_errors_total",
+    "Failed outbound calls by dependency.",
+    ("dependency",),
+)
+ERRORS_TOTAL = registry.counter(
+    "agent_errors_total",
+    "Unhandled errors and 5xx responses by route template.",
+    ("route",),
+)
+INDEX_SCORE_TOTAL = registry.counter(
+    "agent_index_score_total",
+    "Index scores produced by source (ml, estimated) and reason.",
+    ("source", "reason"),
+)
+ACTIVE_SESSIONS = registry.gauge(
+    "agent_sessions_active",
+    "Number of chat sessions currently held by the session manager.",
+)
+SESSION_MESSAGES = registry.gauge(
+    "agent_session_messages",
+    "Total number of messages across all live chat sessions.",
+)
+TURNS_IN_FLIGHT = registry.gauge(
+    "agent_turns_in_flight",
+    "Agent turns currently holding an admission slot.",
+)
+TURNS_QUEUED = registry.gauge(
+    "agent_turns_queued",
+    "Agent turns waiting for a session lock or an admission slot.",
+)
+ADMISSION_REJECTED = registry.counter(
+    "agent_admission_rejected_total",
+    "Turns rejected with 429 by reason (queue_full, queue_timeout, session_busy).",
+    ("reason",),
+)
+TOOL_CALLS = registry.counter(
+    "agent_tool_calls_total",
+    "Agent tool calls by tool and result (ok, memo_hit, timeout, error, unavailable).",
+    ("tool", "result"),
+)
+PREFETCH_TOTAL = registry.counter(
+    "agent_prefetch_total",
+    "Speculative prediction prefetches by result (warmed, cached, skipped_busy, skipped_failed, failed, cancelled).",
+    ("result",),
+)
+PINGS_INGESTED = registry.counter(
+    "agent_pings_ingested_total",
+    "Commuter pings accepted by POST /pings.",
+)
+PING_BUFFER = registry.gauge(
+    "agent_ping_buffer",
+    "Commuter pings buffered in memory waiting to be flushed to the sink.",
+)
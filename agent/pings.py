@@ -0,0 +1,361 @@
+"""
+Commuter Ping Ingestion
+Buffers incoming pings in memory, writes them to the commuter_pings table in bulk,
+and keeps a rolling demand grid that tools can read without running SQL.
+
+Pings are appended to a buffer and flushed by a background task whenever
+PING_FLUSH_SIZE pings are waiting or PING_FLUSH_INTERVAL seconds have passed.
+The buffer is bounded; a full buffer rejects batches with Overloaded (429).
+The sink is Postgres/PostGIS via COPY (app/supabase/migrations/001_init_transit_schema.sql)
+or a local SQLite stand-in for development and tests.
+
+The demand grid counts pings per grid cell (DEMAND_GRID_DEG, the same 0.001
+degree snapping find_transit_hotspots uses) in time buckets over a sliding
+DEMAND_WINDOW_SECONDS window. The grid lives in process memory, so with several
+uvicorn workers each one only counts the pings it received itself; summaries are
+labelled with scope "worker". Route POST /pings to a single worker (or run one)
+when tools need the whole city's demand.
+"""
+import asyncio
+import math
+import os
+import sqlite3
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from .admission import Overloaded
+from .metrics import DEPENDENCY_ERRORS, DEPENDENCY_LATENCY, PINGS_INGESTED
+
+PING_SINK = os.getenv("PING_SINK", "sqlite")  # 'sqlite', 'postgres' or 'none'
+PING_SQLITE_PATH = Path(os.getenv("PING_SQLITE_PATH", str(Path(__file__).parent / "pings.db")))
+PING_DATABASE_URL = os.getenv("PING_DATABASE_URL", os.getenv("DATABASE_URL", ""))
+PING_FLUSH_SIZE = int(os.getenv("PING_FLUSH_SIZE", "5000"))
+PING_FLUSH_INTERVAL = float(os.getenv("PING_FLUSH_INTERVAL", "1.0"))
+PING_BUFFER_MAX = int(os.getenv("PING_BUFFER_MAX", "200000"))
+
+DEMAND_WINDOW_SECONDS = float(os.getenv("DEMAND_WINDOW_SECONDS", "900"))
+DEMAND_BUCKET_SECONDS = float(os.getenv("DEMAND_BUCKET_SECONDS", "60"))
+DEMAND_GRID_DEG = float(os.getenv("DEMAND_GRID_DEG", "0.001"))
+
+# A buffered ping: (device_id, latitude, longitude, accuracy_meters, ping_time as epoch seconds)
+PingRow = tuple[str, float, float, Optional[float], float]
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS commuter_pings (
+    device_id TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    accuracy_meters REAL,
+    ping_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commuter_pings_time_idx ON commuter_pings (ping_time);
+"""
+
+
+class SQLitePingSink:
+    """Local stand-in for public.commuter_pings."""
+
+    def __init__(self, path: Path = PING_SQLITE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Only the flush task writes, one batch at a time, from worker threads
+            self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SQLITE_SCHEMA)
+        return self._conn
+
+    def write(self, rows: list[PingRow]) -> None:
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO commuter_pings (device_id, latitude, longitude, accuracy_meters, ping_time) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class PostgresPingSink:
+    """COPY batches into public.commuter_pings with EWKT point geographies."""
+
+    def __init__(self, dsn: str = PING_DATABASE_URL):
+        self.dsn = dsn
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            # psycopg is only needed when pings go to Postgres
+            import psycopg
+
+            self._conn = psycopg.connect(self.dsn)
+        return self._conn
+
+    def write(self, rows: list[PingRow]) -> None:
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                with cur.copy(
+                    "COPY public.commuter_pings (device_id, location, accuracy_meters, ping_time) FROM STDIN"
+                ) as copy:
+                    for device_id, lat, lng, accuracy, ping_time in rows:
+                        copy.write_row((
+                            device_id,
+                            f"SRID=4326;POINT({lng} {lat})",
+                            accuracy,
+                            datetime.fromtimestamp(ping_time, timezone.utc),
+                        ))
+            conn.commit()
+        except Exception:
+            # Drop the connection so the next flush starts from a clean one
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def create_ping_sink(kind: str = PING_SINK):
+    """Pick the ping sink from PING_SINK."""
+    if kind == "postgres":
+        return PostgresPingSink()
+    if kind == "sqlite":
+        return SQLitePingSink()
+    return None
+
+
+class DemandGrid:
+    """Ping counts per grid cell over a sliding time window."""
+
+    def __init__(
+        self,
+        window_seconds: float = DEMAND_WINDOW_SECONDS,
+        bucket_seconds: float = DEMAND_BUCKET_SECONDS,
+        grid_deg: float = DEMAND_GRID_DEG,
+    ):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.grid_deg = grid_deg
+        # (bucket index, counts) oldest first; totals is the sum over all buckets
+        self._buckets: deque[tuple[int, Counter]] = deque()
+        self._totals: Counter = Counter()
+
+    def _expire(self, now: float) -> None:
+        oldest = int((now - self.window_seconds) // self.bucket_seconds)
+        while self._buckets and self._buckets[0][0] < oldest:
+            _, counts = self._buckets.popleft()
+            self._totals.subtract(counts)
+            for cell in [c for c in counts if self._totals[c] <= 0]:
+                del self._totals[cell]
+
+    def _bucket(self, index: int) -> Counter:
+        for bucket_index, counts in reversed(self._buckets):
+            if bucket_index == index:
+                return counts
+            if bucket_index < index:
+                break
+        counts = Counter()
+        # Buckets stay sorted; late pings for an older bucket are rare and short-lived
+        position = len(self._buckets)
+        while position and self._buckets[position - 1][0] > index:
+            position -= 1
+        self._buckets.insert(position, (index, counts))
+        return counts
+
+    def add(self, rows: list[PingRow], now: Optional[float] = None) -> int:
+        """Count pings inside the window; returns how many were counted."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        cutoff = now - self.window_seconds
+        grid, bucket_seconds = self.grid_deg, self.bucket_seconds
+        counted = 0
+        current_index, current = None, None
+        for _, lat, lng, _, ping_time in rows:
+            if ping_time < cutoff:
+                continue
+            index = int(min(ping_time, now) // bucket_seconds)
+            if index != current_index:
+                current_index, current = index, self._bucket(index)
+            cell = (round(lat / grid), round(lng / grid))
+            current[cell] += 1
+            self._totals[cell] += 1
+            counted += 1
+        return counted
+
+    def _cells_in_bounds(self, south: float, west: float, north: float, east: float):
+        grid = self.grid_deg
+        lat_lo, lat_hi = math.ceil(south / grid - 0.5), math.floor(north / grid + 0.5)
+        lng_lo, lng_hi = math.ceil(west / grid - 0.5), math.floor(east / grid + 0.5)
+        span = (lat_hi - lat_lo + 1) * (lng_hi - lng_lo + 1)
+        totals = self._totals
+        if span > len(totals):
+            # Fewer occupied cells than cells in the box: scan the occupied ones
+            for (lat_i, lng_i), count in totals.items():
+                if lat_lo <= lat_i <= lat_hi and lng_lo <= lng_i <= lng_hi:
+                    yield lat_i, lng_i, count
+        else:
+            for lat_i in range(lat_lo, lat_hi + 1):
+                for lng_i in range(lng_lo, lng_hi + 1):
+                    count = totals.get((lat_i, lng_i))
+                    if count:
+                        yield lat_i, lng_i, count
+
+    def _summary(self, cells: list[tuple[int, int, int]], area_km2: float) -> dict:
+        total = sum(count for _, _, count in cells)
+        window_minutes = self.window_seconds / 60
+        hotspots = sorted(cells, key=lambda c: c[2], reverse=True)[:5]
+        return {
+            # Only pings this process received; other workers keep their own grids
+            "scope": "worker",
+            "worker_pid": os.getpid(),
+            "window_minutes": round(window_minutes, 1),
+            "pings": total,
+            "pings_per_minute": round(total / window_minutes, 2),
+            "pings_per_km2": round(total / area_km2, 2) if area_km2 else None,
+            "active_cells": len(cells),
+            "hotspots": [
+                {"lat": round(lat_i * self.grid_deg, 6), "lng": round(lng_i * self.grid_deg, 6), "pings": count}
+                for lat_i, lng_i, count in hotspots
+            ],
+        }
+
+    def query_bounds(self, south: float, west: float, north: float, east: float) -> dict:
+        """Demand inside a bounding box."""
+        self._expire(time.time())
+        cells = list(self._cells_in_bounds(south, west, north, east))
+        height_km = (north - south) * 111.32
+        width_km = (east - west) * 111.32 * math.cos(math.radians((north + south) / 2))
+        return self._summary(cells, abs(height_km * width_km))
+
+    def query_radius(self, latitude: float, longitude: float, radius_km: float) -> dict:
+        """Demand within radius_km of a point."""
+        self._expire(time.time())
+        d_lat = radius_km / 111.32
+        d_lng = radius_km / (111.32 * math.cos(math.radians(latitude)))
+        grid = self.grid_deg
+        cells = [
+            (lat_i, lng_i, count)
+            for lat_i, lng_i, count in self._cells_in_bounds(
+                latitude - d_lat, longitude - d_lng, latitude + d_lat, longitude + d_lng
+            )
+            if ((lat_i * grid - latitude) / d_lat) ** 2 + ((lng_i * grid - longitude) / d_lng) ** 2 <= 1
+        ]
+        return self._summary(cells, math.pi * radius_km ** 2)
+
+
+class PingIngestor:
+    """Bounded in-memory ping buffer with size/time-triggered bulk flushes."""
+
+    def __init__(
+        self,
+        sink=None,
+        grid: Optional[DemandGrid] = None,
+        flush_size: int = PING_FLUSH_SIZE,
+        flush_interval: float = PING_FLUSH_INTERVAL,
+        max_buffer: int = PING_BUFFER_MAX,
+    ):
+        self.sink = sink
+        self.grid = grid or DemandGrid()
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: list[PingRow] = []
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_requested: Optional[asyncio.Event] = None
+        self._avg_flush_seconds = 0.1
+
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def submit(self, rows: list[PingRow]) -> int:
+        """Accept a batch: count it in the demand grid and queue it for the sink."""
+        if self.sink is not None and len(self._buffer) + len(rows) > self.max_buffer:
+            # The sink is falling behind; tell the sender when the backlog should be gone
+            backlog = math.ceil(len(self._buffer) / max(self.flush_size, 1))
+            raise Overloaded("ping_buffer_full", max(1, math.ceil(backlog * self._avg_flush_seconds)))
+        self.grid.add(rows)
+        PINGS_INGESTED.inc(amount=len(rows))
+        if self.sink is not None:
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.flush_size and self._flush_requested is not None:
+                self._flush_requested.set()
+        return len(rows)
+
+    def start(self) -> None:
+        """Start the background flush loop (needs a running event loop)."""
+        if self.sink is not None and self._task is None:
+            self._flush_requested = asyncio.Event()
+            self._stop_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out whatever is still buffered."""
+        if self._task is not None:
+            # Let an in-flight flush finish: cancelling it would drop its batch
+            # and close the sink while the write is still running in its thread
+            self._stop_requested.set()
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+        while self._buffer:
+            if not await self.flush():
+                break
+        if self.sink is not None:
+            self.sink.close()
+
+    @staticmethod
+    async def _wait(event: asyncio.Event, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _flush_loop(self) -> None:
+        while not self._stop_requested.is_set():
+            await self._wait(self._flush_requested, self.flush_interval)
+            self._flush_requested.clear()
+            while self._buffer and not self._stop_requested.is_set():
+                if not await self.flush():
+                    # Sink is down: back off for an interval (cut short only by stop) and keep the pings
+                    await self._wait(self._stop_requested, self.flush_interval)
+                    break
+                if len(self._buffer) < self.flush_size:
+                    break
+
+    async def flush(self) -> bool:
+        """Write up to flush_size buffered pings; returns False if the sink failed."""
+        if not self._buffer or self.sink is None:
+            return True
+        batch = self._buffer[:self.flush_size]
+        del self._buffer[:len(batch)]
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.sink.write, batch)
+            return True
+        except Exception as e:
+            DEPENDENCY_ERRORS.inc(dependency="ping_sink")
+            print(f"⚠️ Ping flush failed, {len(batch)} pings kept for retry: {e}")
+            self._buffer[:0] = batch
+            return False
+        finally:
+            elapsed = time.perf_counter() - start
+            self._avg_flush_seconds = 0.8 * self._avg_flush_seconds + 0.2 * elapsed
+            DEPENDENCY_LATENCY.observe(elapsed, dependency="ping_sink")
+
+
+# Global ingestor; the flush loop is started by the API server's lifespan
+ping_ingestor = PingIngestor(sink=create_ping_sink())
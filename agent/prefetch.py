@@ -0,0 +1,114 @@
+"""
+Speculative Prediction Prefetch
+After a map selection, warms the prediction cache for where the planner is likely to click next.
+
+Follow-up clicks tend to land on an adjacent grid cell or widen the radius, so
+after /chat/coordinates answers, the session's prefetch task fetches:
+  - the selected cell at the common radii (PREFETCH_RADII_KM)
+  - the surrounding ring(s) of cells on the prediction grid at the selected radius
+Prefetches run a few at a time, give way whenever agent turns are queued or the ML
+limiter is saturated, and the task is cancelled as soon as the session selects
+somewhere else. A run stops at its first failed prediction, so an ML outage costs
+at most PREFETCH_CONCURRENCY requests per click, and every outstanding run is
+cancelled when the server shuts down.
+"""
+import asyncio
+import functools
+import os
+from typing import Optional
+
+from .admission import admission, ml_limiter
+from .metrics import PREFETCH_TOTAL
+from .shared_state import get_state_store, run_store_call
+from .tools import PREDICTION_GRID_DEG, get_ml_predictions, prediction_cache_key
+
+PREFETCH_ENABLED = os.getenv("AGENT_PREFETCH", "1") == "1"
+PREFETCH_RING = int(os.getenv("PREFETCH_RING", "1"))
+PREFETCH_RADII_KM = tuple(float(r) for r in os.getenv("PREFETCH_RADII_KM", "0.5,1,2,5").split(","))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_PREDICTION_TYPE = "traffic"
+
+
+def prefetch_targets(latitude: float, longitude: float, radius_km: float) -> list[tuple[float, float, float]]:
+    """(lat, lng, radius_km) to warm, most likely next click first."""
+    targets = [(latitude, longitude, radius) for radius in PREFETCH_RADII_KM if radius != radius_km]
+    for ring in range(1, PREFETCH_RING + 1):
+        for d_lat in range(-ring, ring + 1):
+            for d_lng in range(-ring, ring + 1):
+                if max(abs(d_lat), abs(d_lng)) != ring:
+                    continue
+                targets.append((
+                    latitude + d_lat * PREDICTION_GRID_DEG,
+                    longitude + d_lng * PREDICTION_GRID_DEG,
+                    radius_km,
+                ))
+    return targets
+
+
+class Prefetcher:
+    """One low-priority prefetch task per session, replaced on every new selection."""
+
+    def __init__(self, concurrency: int = PREFETCH_CONCURRENCY):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def cancel(self, session_id: str) -> None:
+        """Stop warming around the session's previous selection."""
+        task = self._tasks.pop(session_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            PREFETCH_TOTAL.inc(result="cancelled")
+
+    def cancel_all(self) -> None:
+        """Stop every outstanding prefetch (server shutdown)."""
+        for session_id in list(self._tasks):
+            self.cancel(session_id)
+
+    def schedule(self, session_id: str, latitude: float, longitude: float, radius_km: float) -> Optional[asyncio.Task]:
+        """Start warming around a selection, replacing the session's previous prefetch."""
+        self.cancel(session_id)
+        if not PREFETCH_ENABLED:
+            return None
+        task = asyncio.create_task(self._run(latitude, longitude, radius_km))
+        self._tasks[session_id] = task
+        task.add_done_callback(functools.partial(self._forget, session_id))
+        return task
+
+    def _forget(self, session_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(session_id) is task:
+            del self._tasks[session_id]
+
+    async def _run(self, latitude: float, longitude: float, radius_km: float) -> None:
+        store = get_state_store()
+        pending = []
+        for lat, lng, radius in prefetch_targets(latitude, longitude, radius_km):
+            key = prediction_cache_key(lat, lng, radius, PREFETCH_PREDICTION_TYPE)
+            if await run_store_call(store.cache_get, "predictions", key) is None:
+                pending.append((lat, lng, radius))
+            else:
+                PREFETCH_TOTAL.inc(result="cached")
+        failed = asyncio.Event()
+        await asyncio.gather(*(self._warm(lat, lng, radius, failed) for lat, lng, radius in pending))
+
+    async def _warm(self, latitude: float, longitude: float, radius_km: float, failed: asyncio.Event) -> None:
+        async with self._semaphore:
+            # The ML service is failing; don't keep hitting it on a speculative path
+            if failed.is_set():
+                PREFETCH_TOTAL.inc(result="skipped_failed")
+                return
+            # Real turns always win: don't take ML capacity while anyone is waiting
+            if admission.waiting or ml_limiter.locked():
+                PREFETCH_TOTAL.inc(result="skipped_busy")
+                return
+            result = await get_ml_predictions(
+                latitude, longitude, radius_km=radius_km, prediction_type=PREFETCH_PREDICTION_TYPE
+            )
+            if "error" in result:
+                failed.set()
+                PREFETCH_TOTAL.inc(result="failed")
+            else:
+                PREFETCH_TOTAL.inc(result="warmed")
+
+
+# Global prefetcher
+prefetcher = Prefetcher()
@@ -0,0 +1,239 @@
+"""
+Response Layer for Large Payloads
+Fast JSON rendering, NDJSON streaming and negotiated gzip/brotli compression.
+
+- FastJSONResponse renders with orjson (datetimes, UUIDs and numpy values included)
+  and falls back to the stdlib encoder when orjson isn't installed. Endpoints that
+  build their payload themselves return it directly, skipping FastAPI's
+  response_model re-validation and jsonable_encoder pass.
+- ndjson_response() streams long lists one JSON document per line, for clients
+  that send `Accept: application/x-ndjson` or `?format=ndjson`.
+- CompressionMiddleware compresses bodies above a size threshold with brotli
+  (if installed) or gzip, following the client's Accept-Encoding.
+"""
+import gzip
+import json
+import os
+import zlib
+from datetime import date, datetime
+from typing import Any, Iterable, Optional
+from uuid import UUID
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Lines per streamed chunk; one chunk per item would mean one send per item
+_NDJSON_LINES_PER_CHUNK = 256
+
+# Binary or already-compressed payloads gain nothing from another pass
+_INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def wants_ndjson(request: Request) -> bool:
+    """True when the client asked for newline-delimited JSON."""
+    if request.query_params.get("format") == "ndjson":
+        return True
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(items: Iterable[Any], headers: Optional[dict] = None) -> StreamingResponse:
+    """Stream items as newline-delimited JSON."""
+
+    def lines():
+        chunk = []
+        for item in items:
+            chunk.append(dumps(item))
+            if len(chunk) >= _NDJSON_LINES_PER_CHUNK:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q-values."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip()] = quality
+
+    wildcard = weights.get("*", 0.0)
+    candidates = [("br", brotli is not None), ("gzip", True)]
+    best, best_quality = None, 0.0
+    for name, available in candidates:
+        quality = weights.get(name, wildcard)
+        if available and quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._encoder = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 writes the gzip header and trailer
+            self._encoder = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._encoder.process(data)
+            return out + self._encoder.flush() if flush else out
+        out = self._encoder.compress(data)
+        # Sync-flush streamed chunks so NDJSON lines reach the client promptly
+        return out + self._encoder.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._encoder.process(data) + self._encoder.finish()
+        return self._encoder.compress(data) + self._encoder.flush(zlib.Z_FINISH)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """One-shot compression of a complete body."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses larger than minimum_size."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (
+                    b"content-encoding" in headers
+                    or message["status"] < 200
+                    or message["status"] in (204, 304)
+                    or content_type.startswith(_INCOMPRESSIBLE_PREFIXES)
+                ):
+                    state["passthrough"] = True
+                    await send(message)
+                else:
+                    # Hold the start until the body shows whether compression pays off
+                    state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            compressor = state["compressor"]
+
+            if compressor is None and not more_body:
+                # Whole body in one message: compress it in one go, or not at all
+                state["passthrough"] = True
+                if len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                compressed = compress_body(body, encoding)
+                await send(self._with_encoding_headers(start, encoding, len(compressed)))
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            if compressor is None:
+                # Streaming response: compress chunk by chunk without Content-Length
+                compressor = state["compressor"] = _Compressor(encoding)
+                await send(self._with_encoding_headers(start, encoding, None))
+
+            if more_body:
+                await send({"type": "http.response.body", "body": compressor.compress(body, flush=True), "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _with_encoding_headers(start: dict, encoding: str, content_length: Optional[int]) -> dict:
+        headers = [
+            (name, value) for name, value in start.get("headers", [])
+            if name not in (b"content-length", b"vary")
+        ]
+        vary = [value for name, value in start.get("headers", []) if name == b"vary"]
+        vary_value = b", ".join(vary + [b"Accept-Encoding"]) if vary else b"Accept-Encoding"
+        headers.append((b"content-encoding", encoding.encode("latin-1")))
+        headers.append((b"vary", vary_value))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return {**start, "headers": headers}
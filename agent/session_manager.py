@@ -2,11 +2,14 @@
 Session Manager for Multi-Chat Support
 Handles multiple concurrent chat sessions with separate contexts.
 """
+import json
 import uuid
 from datetime import datetime
 from typing import Optional
 from dataclasses import dataclass, field
 
+from .shared_state import STATE_BACKEND, SQLiteStateStore, get_state_store
+
 
 @dataclass
 class ChatMessage:
@@ -101,6 +104,27 @@ class SessionManager:
             )
         ]
     
+    def add_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        coordinates: Optional[dict] = None
+    ) -> Optional[ChatMessage]:
+        """Append a message to a session's history."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        return session.add_message(role, content, coordinates=coordinates)
+    
+    def session_count(self) -> int:
+        """Number of live sessions."""
+        return len(self._sessions)
+    
+    def message_count(self) -> int:
+        """Total number of messages across all live sessions."""
+        return sum(len(session.messages) for session in list(self._sessions.values()))
+    
     def delete_session(self, session_id: str) -> bool:
         """Delete a session by ID."""
         if session_id in self._sessions:
@@ -118,5 +142,155 @@ class SessionManager:
         return False
 
 
+class SQLiteSessionManager:
+    """
+    Session manager backed by the shared SQLite state store.
+    Every uvicorn worker on the host sees the same sessions; each write is a
+    single IMMEDIATE transaction, so concurrent updates never interleave.
+    Sessions returned from here are snapshots: write through the manager.
+    """
+    
+    def __init__(self, store: SQLiteStateStore):
+        self._store = store
+    
+    @staticmethod
+    def _row_to_message(row) -> ChatMessage:
+        return ChatMessage(
+            role=row["role"],
+            content=row["content"],
+            timestamp=datetime.fromisoformat(row["timestamp"]),
+            coordinates=json.loads(row["coordinates"]) if row["coordinates"] else None
+        )
+    
+    def create_session(self, name: Optional[str] = None) -> ChatSession:
+        """Create a new chat session."""
+        session_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        
+        with self._store.transaction() as conn:
+            if name is None:
+                count = conn.execute("SELECT count(*) FROM sessions").fetchone()[0]
+                name = f"Chat {count + 1}"
+            conn.execute(
+                "INSERT INTO sessions (id, name, created_at, updated_at, context) VALUES (?, ?, ?, ?, '{}')",
+                (session_id, name, now.isoformat(), now.isoformat())
+            )
+        
+        return ChatSession(id=session_id, name=name, created_at=now, updated_at=now)
+    
+    def get_session(self, session_id: str) -> Optional[ChatSession]:
+        """Get a session (with its messages) by ID."""
+        conn = self._store.connection()
+        row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        messages = conn.execute(
+            "SELECT role, content, timestamp, coordinates FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        return ChatSession(
+            id=row["id"],
+            name=row["name"],
+            created_at=datetime.fromisoformat(row["created_at"]),
+            updated_at=datetime.fromisoformat(row["updated_at"]),
+            messages=[self._row_to_message(m) for m in messages],
+            context=json.loads(row["context"])
+        )
+    
+    def get_or_create_session(self, session_id: Optional[str] = None) -> ChatSession:
+        """Get existing session or create a new one."""
+        if session_id:
+            session = self.get_session(session_id)
+            if session is not None:
+                return session
+        return self.create_session()
+    
+    def list_sessions(self) -> list[dict]:
+        """List all sessions with summary info."""
+        rows = self._store.connection().execute(
+            """
+            SELECT s.id, s.name, s.created_at, s.updated_at, s.context,
+                   (SELECT count(*) FROM messages m WHERE m.session_id = s.id) AS message_count
+            FROM sessions s
+            ORDER BY s.updated_at DESC
+            """
+        ).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "created_at": row["created_at"],
+                "updated_at": row["updated_at"],
+                "message_count": row["message_count"],
+                "context": json.loads(row["context"])
+            }
+            for row in rows
+        ]
+    
+    def add_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        coordinates: Optional[dict] = None
+    ) -> Optional[ChatMessage]:
+        """Append a message and bump the session's updated_at atomically."""
+        message = ChatMessage(role=role, content=content, coordinates=coordinates)
+        with self._store.transaction() as conn:
+            updated = conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE id = ?",
+                (message.timestamp.isoformat(), session_id)
+            )
+            if updated.rowcount == 0:
+                return None
+            conn.execute(
+                "INSERT INTO messages (session_id, role, content, timestamp, coordinates) VALUES (?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    role,
+                    content,
+                    message.timestamp.isoformat(),
+                    json.dumps(coordinates) if coordinates is not None else None
+                )
+            )
+        return message
+    
+    def session_count(self) -> int:
+        """Number of live sessions."""
+        return self._store.connection().execute("SELECT count(*) FROM sessions").fetchone()[0]
+    
+    def message_count(self) -> int:
+        """Total number of messages across all live sessions."""
+        return self._store.connection().execute("SELECT count(*) FROM messages").fetchone()[0]
+    
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session and its messages by ID."""
+        with self._store.transaction() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            deleted = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        return deleted.rowcount > 0
+    
+    def update_session_context(self, session_id: str, context_update: dict) -> bool:
+        """Merge into a session's context as one read-modify-write transaction."""
+        with self._store.transaction() as conn:
+            row = conn.execute("SELECT context FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return False
+            context = json.loads(row["context"])
+            context.update(context_update)
+            conn.execute(
+                "UPDATE sessions SET context = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(context), datetime.utcnow().isoformat(), session_id)
+            )
+        return True
+
+
+def create_session_manager():
+    """Pick the session manager for the configured state backend."""
+    if STATE_BACKEND == "sqlite":
+        return SQLiteSessionManager(get_state_store())
+    return SessionManager()
+
+
 # Global session manager instance
-session_manager = SessionManager()
+session_manager = create_session_manager()
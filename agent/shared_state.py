@@ -0,0 +1,269 @@
+"""
+Shared State Store for the Dubai RTA Agent
+Backs session metadata, TTL caches and per-session locks so that several
+uvicorn worker processes on the same host see the same state.
+
+Two backends share one interface:
+- MemoryStateStore: process-local, the default for single-worker dev runs
+- SQLiteStateStore: a WAL-mode SQLite file every worker opens (AGENT_STATE_BACKEND=sqlite)
+
+SQLite calls block, so async code runs them through run_store_call(), which moves
+them to a worker thread when the SQLite backend is active.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+_agent_dir = Path(__file__).parent
+
+STATE_BACKEND = os.getenv("AGENT_STATE_BACKEND", "memory")
+STATE_DB_PATH = Path(os.getenv("AGENT_STATE_DB", str(_agent_dir / "state.db")))
+
+# A lock held longer than this is assumed to belong to a crashed worker;
+# live holders renew it every LOCK_RENEW_SECONDS
+LOCK_LEASE_SECONDS = 120.0
+LOCK_RENEW_SECONDS = LOCK_LEASE_SECONDS / 4
+
+# How long one SQLite statement waits for another worker's write lock
+STATE_BUSY_TIMEOUT = float(os.getenv("AGENT_STATE_BUSY_TIMEOUT", "5"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    context TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_idx ON sessions (updated_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    coordinates TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_session_idx ON messages (session_id, id);
+
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires_at);
+
+CREATE TABLE IF NOT EXISTS session_locks (
+    session_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a per-session lock could not be acquired in time."""
+
+
+class MemoryStateStore:
+    """Process-local state store with the same interface as SQLiteStateStore."""
+
+    def __init__(self, max_cache_entries: int = 10_000):
+        self.max_cache_entries = max_cache_entries
+        self._cache: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._session_locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {}
+        self._guard = threading.Lock()
+
+    def cache_get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return a cached value, or None if missing or expired."""
+        with self._guard:
+            entry = self._cache.get((namespace, key))
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._cache[(namespace, key)]
+                return None
+            self._cache.move_to_end((namespace, key))
+            return value
+
+    def cache_set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        """Store a value for `ttl` seconds, evicting the least recently used entries."""
+        with self._guard:
+            self._cache[(namespace, key)] = (time.time() + ttl, value)
+            self._cache.move_to_end((namespace, key))
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+
+    @asynccontextmanager
+    async def session_lock(self, session_id: str, timeout: float = 30.0):
+        """Serialize work on one session within this process."""
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        self._lock_users[session_id] = self._lock_users.get(session_id, 0) + 1
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), timeout)
+            except asyncio.TimeoutError:
+                raise LockTimeout(f"Session {session_id} is busy")
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            # Drop the lock once nobody holds or waits for it
+            self._lock_users[session_id] -= 1
+            if self._lock_users[session_id] == 0:
+                del self._lock_users[session_id]
+                self._session_locks.pop(session_id, None)
+
+
+class SQLiteStateStore:
+    """SQLite-backed state store shared by all worker processes on a host."""
+
+    def __init__(self, path: Path = STATE_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        # executescript() manages its own commit, so it runs outside transaction()
+        self.connection().executescript(_SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=STATE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block atomically; BEGIN IMMEDIATE takes the write lock up front."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def cache_get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return a cached value, or None if missing or expired."""
+        row = self.connection().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None or row["expires_at"] < time.time():
+            return None
+        return json.loads(row["value"])
+
+    def cache_set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        """Store a JSON-serializable value for `ttl` seconds."""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now + ttl),
+            )
+            # Opportunistic sweep keeps the table from growing without bound
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+
+    def _try_acquire(self, session_id: str, owner: str) -> bool:
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "DELETE FROM session_locks WHERE session_id = ? AND expires_at < ?",
+                (session_id, now),
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO session_locks (session_id, owner, expires_at) VALUES (?, ?, ?)",
+                (session_id, owner, now + LOCK_LEASE_SECONDS),
+            )
+            return cursor.rowcount == 1
+
+    def _renew(self, session_id: str, owner: str) -> bool:
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE session_locks SET expires_at = ? WHERE session_id = ? AND owner = ?",
+                (time.time() + LOCK_LEASE_SECONDS, session_id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def _release(self, session_id: str, owner: str) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "DELETE FROM session_locks WHERE session_id = ? AND owner = ?",
+                (session_id, owner),
+            )
+
+    async def _keep_lease(self, session_id: str, owner: str) -> None:
+        """Extend the lease while the lock is held, so long turns don't lose it."""
+        while True:
+            await asyncio.sleep(LOCK_RENEW_SECONDS)
+            try:
+                renewed = await asyncio.to_thread(self._renew, session_id, owner)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not renew the lock on session {session_id}: {e}")
+                continue
+            if not renewed:
+                print(f"⚠️ Lock on session {session_id} expired while held")
+                return
+
+    @asynccontextmanager
+    async def session_lock(self, session_id: str, timeout: float = 30.0):
+        """Serialize work on one session across every worker process."""
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while True:
+            try:
+                if await asyncio.to_thread(self._try_acquire, session_id, owner):
+                    break
+            except sqlite3.OperationalError:
+                # Another worker held the write lock past the busy timeout; retry
+                pass
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Session {session_id} is busy")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        renewer = asyncio.create_task(self._keep_lease(session_id, owner))
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            # Shielded so a cancelled turn still releases the lock
+            await asyncio.shield(asyncio.to_thread(self._release, session_id, owner))
+
+
+@lru_cache(maxsize=1)
+def get_state_store():
+    """Return the process-wide state store for the configured backend."""
+    if STATE_BACKEND == "sqlite":
+        return SQLiteStateStore(STATE_DB_PATH)
+    return MemoryStateStore()
+
+
+async def run_store_call(fn, *args, **kwargs):
+    """Call a state-store or session-manager method without blocking the event loop."""
+    if STATE_BACKEND == "sqlite":
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    # Memory backend calls are cheap dict operations
+    return fn(*args, **kwargs)
@@ -0,0 +1,175 @@
+"""
+Tool Execution Runtime
+Wraps the agent's tools with a timeout budget and a short-lived per-session memo.
+
+The memo holds the running task, not just the result, so a repeated call with the
+same arguments awaits the first one instead of recomputing it. When the model asks
+for several tools in one response, run_agent calls start_calls() as soon as that
+event arrives: every call is started at once, and when ADK then executes them one
+by one each finds its task already in flight. A multi-tool turn therefore takes as
+long as its slowest tool instead of the sum. Only reuse across separate calls counts
+as a memo hit: ADK picking up a call start_calls() began for it does not.
+
+Fields that must stay live (e.g. the ping-based live_demand) are recomputed on
+every call by the tool's refresh function, so the memo never serves them stale.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from .metrics import TOOL_CALLS
+from .tracing import active_trace
+
+TOOL_MEMO_TTL = float(os.getenv("TOOL_MEMO_TTL", "60"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+
+# Results with these statuses are returned but never reused
+_UNCACHEABLE_STATUSES = {"error", "timeout", "unavailable"}
+
+_current_session: ContextVar[Optional[str]] = ContextVar("tool_session", default=None)
+
+
+def _memo_key(session_id: str, tool_name: str, arguments: dict) -> str:
+    return f"{session_id}:{tool_name}:{json.dumps(arguments, sort_keys=True, default=str)}"
+
+
+class ToolRuntime:
+    """Registry of wrapped tools with per-session memoization and timeouts."""
+
+    def __init__(self, memo_ttl: float = TOOL_MEMO_TTL, default_timeout: float = TOOL_TIMEOUT):
+        self.memo_ttl = memo_ttl
+        self.default_timeout = default_timeout
+        self._tools: dict[str, tuple[Callable[..., Awaitable[dict]], inspect.Signature, float]] = {}
+        self._memo: dict[str, tuple[float, asyncio.Task]] = {}
+        # Memo keys started by start_calls() that ADK has not picked up yet
+        self._prestarted: set[str] = set()
+
+    @contextmanager
+    def session(self, session_id: str):
+        """Attribute tool calls made inside the block to a chat session."""
+        token = _current_session.set(session_id)
+        try:
+            yield
+        finally:
+            _current_session.reset(token)
+
+    def wrap(
+        self,
+        fn: Callable[..., Awaitable[dict]],
+        timeout: Optional[float] = None,
+        refresh: Optional[Callable[[dict, dict], dict]] = None,
+    ):
+        """
+        Return fn behind the runtime; name, signature and docstring are kept for ADK.
+        refresh(result, arguments), if given, runs on every call's (possibly reused)
+        result and returns a copy with its live fields brought up to date.
+        """
+        signature = inspect.signature(fn)
+        self._tools[fn.__name__] = (fn, signature, timeout or self.default_timeout)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            task = self._start(fn.__name__, arguments)
+            result = await asyncio.shield(task)
+            return refresh(result, arguments) if refresh is not None else result
+
+        return wrapper
+
+    def start_calls(self, calls: Iterable[Any]) -> int:
+        """Start every known function call of a model response concurrently; returns how many."""
+        started = 0
+        for call in calls:
+            entry = self._tools.get(call.name)
+            if entry is None:
+                continue
+            try:
+                bound = entry[1].bind(**(call.args or {}))
+            except TypeError:
+                # Let ADK report the bad arguments when it runs the call itself
+                continue
+            bound.apply_defaults()
+            self._start(call.name, dict(bound.arguments), prestart=True)
+            started += 1
+        return started
+
+    def forget_session(self, session_id: str) -> None:
+        prefix = f"{session_id}:"
+        for key in [k for k in self._memo if k.startswith(prefix)]:
+            del self._memo[key]
+            self._prestarted.discard(key)
+
+    def _start(self, tool_name: str, arguments: dict, prestart: bool = False) -> asyncio.Task:
+        session_id = _current_session.get()
+        now = time.monotonic()
+        key = _memo_key(session_id, tool_name, arguments) if session_id else None
+        if key is not None:
+            entry = self._memo.get(key)
+            if entry is not None and entry[0] > now:
+                if prestart:
+                    return entry[1]
+                if key in self._prestarted:
+                    # ADK running the call we started early: same call, not a reuse
+                    self._prestarted.discard(key)
+                else:
+                    TOOL_CALLS.inc(tool=tool_name, result="memo_hit")
+                    trace = active_trace()
+                    if trace is not None:
+                        # The work ran elsewhere; still show the call in this turn
+                        with trace.tool_span(tool_name, arguments) as span:
+                            span.finish(end=span.start, status="memo_hit")
+                return entry[1]
+
+        task = asyncio.ensure_future(self._run(tool_name, arguments))
+        if key is not None:
+            self._purge(now)
+            self._memo[key] = (now + self.memo_ttl, task)
+            if prestart:
+                self._prestarted.add(key)
+            task.add_done_callback(functools.partial(self._drop_failed, key))
+        return task
+
+    async def _run(self, tool_name: str, arguments: dict) -> dict:
+        fn, _, timeout = self._tools[tool_name]
+        trace = active_trace()
+        with trace.tool_span(tool_name, arguments) if trace is not None else nullcontext() as span:
+            try:
+                result = await asyncio.wait_for(fn(**arguments), timeout)
+            except asyncio.TimeoutError:
+                result = {
+                    "error": f"{tool_name} did not finish within {timeout:g}s",
+                    "status": "timeout"
+                }
+            except Exception:
+                TOOL_CALLS.inc(tool=tool_name, result="error")
+                raise
+            status = result.get("status") if isinstance(result, dict) else None
+            TOOL_CALLS.inc(tool=tool_name, result=status if status in _UNCACHEABLE_STATUSES else "ok")
+            if span is not None:
+                span.finish(status=status or "ok", error=result.get("error") if isinstance(result, dict) else None)
+        return result
+
+    def _drop_failed(self, key: str, task: asyncio.Task) -> None:
+        result = None if task.cancelled() or task.exception() else task.result()
+        if not isinstance(result, dict) or result.get("status") in _UNCACHEABLE_STATUSES:
+            entry = self._memo.get(key)
+            if entry is not None and entry[1] is task:
+                del self._memo[key]
+                self._prestarted.discard(key)
+
+    def _purge(self, now: float) -> None:
+        for key in [k for k, (expires, _) in self._memo.items() if expires <= now]:
+            del self._memo[key]
+            self._prestarted.discard(key)
+
+
+# Global runtime shared by the agent's tools
+tool_runtime = ToolRuntime()
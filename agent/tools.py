@@ -2,13 +2,36 @@
 Custom tools for the Dubai RTA City Planning Agent.
 These tools allow the agent to interact with ML APIs and analyze transport data.
 """
+import asyncio
 import os
+import time
 import httpx
 from typing import Optional
 
+from .admission import ml_limiter
+from .metrics import DEPENDENCY_ERRORS, DEPENDENCY_LATENCY
+from .pings import ping_ingestor
+from .shared_state import get_state_store, run_store_call
+
 # ML API URL from environment
 ML_API_URL = os.getenv("ML_API_URL", "http://localhost:8000/predict")
 
+# Predictions are cached per grid cell (degrees, ~110 m at 0.001) for a short TTL
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+PREDICTION_GRID_DEG = float(os.getenv("PREDICTION_GRID_DEG", "0.001"))
+
+
+def prediction_cache_key(
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    prediction_type: str
+) -> str:
+    """Cache key snapping coordinates to the prediction grid."""
+    lat_cell = round(latitude / PREDICTION_GRID_DEG)
+    lng_cell = round(longitude / PREDICTION_GRID_DEG)
+    return f"{prediction_type}:{lat_cell}:{lng_cell}:{radius_km:.2f}"
+
 
 async def get_ml_predictions(
     latitude: float,
@@ -26,10 +49,29 @@ async def get_ml_predictions(
         prediction_type: Type of prediction - 'traffic', 'demand', or 'congestion'
     
     Returns:
-        Dictionary containing ML predictions and analysis
+        Dictionary containing ML predictions and analysis, plus live commuter
+        demand around the point from recent pings
     """
+    result = await _fetch_ml_predictions(latitude, longitude, radius_km, prediction_type)
+    # Copy: cached results are shared between callers
+    return {**result, "live_demand": ping_ingestor.grid.query_radius(latitude, longitude, radius_km)}
+
+
+async def _fetch_ml_predictions(
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    prediction_type: str
+) -> dict:
+    store = get_state_store()
+    cache_key = prediction_cache_key(latitude, longitude, radius_km, prediction_type)
+    cached = await run_store_call(store.cache_get, "predictions", cache_key)
+    if cached is not None:
+        return cached
+    
+    start = time.perf_counter()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with ml_limiter, httpx.AsyncClient(timeout=30.0) as client:
             response = await client.post(
                 ML_API_URL,
                 json={
@@ -40,18 +82,25 @@ async def get_ml_predictions(
                 }
             )
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+        # Only successful predictions are cached; failures retry on the next call
+        await run_store_call(store.cache_set, "predictions", cache_key, result, PREDICTION_CACHE_TTL)
+        return result
     except httpx.HTTPError as e:
+        DEPENDENCY_ERRORS.inc(dependency="ml_service")
         return {
             "error": f"ML API request failed: {str(e)}",
             "status": "unavailable",
             "fallback_message": "The ML prediction service is currently unavailable. Please try again later or provide manual analysis."
         }
     except Exception as e:
+        DEPENDENCY_ERRORS.inc(dependency="ml_service")
         return {
             "error": f"Unexpected error: {str(e)}",
             "status": "error"
         }
+    finally:
+        DEPENDENCY_LATENCY.observe(time.perf_counter() - start, dependency="ml_service")
 
 
 async def analyze_transport_coverage(
@@ -110,7 +159,8 @@ async def get_area_statistics(
         include_traffic: Whether to include traffic pattern data
     
     Returns:
-        Dictionary containing area statistics
+        Dictionary containing area statistics, including live commuter demand
+        from recent pings when traffic data is requested
     """
     # Extract coordinates info for the response
     if "lat" in coordinates and "lng" in coordinates:
@@ -122,7 +172,7 @@ async def get_area_statistics(
     else:
         location_desc = f"Coordinates: {coordinates}"
     
-    return {
+    result = {
         "location": location_desc,
         "coordinates": coordinates,
         "data_requested": {
@@ -132,11 +182,94 @@ async def get_area_statistics(
         "status": "ready_for_analysis",
         "message": "Area selected for analysis. Use available tools and knowledge to provide comprehensive city planning insights."
     }
+    
+    if include_traffic:
+        live_demand = _area_live_demand(coordinates)
+        if live_demand is not None:
+            result["live_demand"] = live_demand
+    
+    return result
+
+
+def _area_live_demand(coordinates: dict) -> Optional[dict]:
+    """Live demand from the in-memory ping grid, no database query."""
+    try:
+        if "lat" in coordinates and "lng" in coordinates:
+            return ping_ingestor.grid.query_radius(
+                float(coordinates["lat"]), float(coordinates["lng"]), float(coordinates.get("radius", 1.0))
+            )
+        if all(k in coordinates for k in ["north", "south", "east", "west"]):
+            return ping_ingestor.grid.query_bounds(
+                float(coordinates["south"]), float(coordinates["west"]),
+                float(coordinates["north"]), float(coordinates["east"])
+            )
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def refresh_live_demand(result: dict, arguments: dict) -> dict:
+    """Copy of a (possibly memoized) tool result with live_demand recomputed now."""
+    if not isinstance(result, dict) or "live_demand" not in result:
+        return result
+    if "coordinates" in arguments:
+        live_demand = _area_live_demand(arguments["coordinates"])
+    else:
+        live_demand = ping_ingestor.grid.query_radius(
+            arguments["latitude"], arguments["longitude"], arguments["radius_km"]
+        )
+    return {**result, "live_demand": live_demand}
+
+
+async def propose_new_stops(
+    num_stops: int = 5,
+    coverage_radius_m: float = 500.0,
+    bounds: Optional[dict] = None
+) -> dict:
+    """
+    Propose locations for new public transport stops that cover the most residents
+    who currently have no stop within walking distance.
+    
+    Args:
+        num_stops: How many new stops to place (1-50, default: 5)
+        coverage_radius_m: Walking distance a stop serves, in meters (default: 500)
+        bounds: Optional dictionary with 'north', 'south', 'east', 'west' to limit the search to a map area
+    
+    Returns:
+        Dictionary with ranked stop locations, the population each newly covers,
+        and population coverage before and after
+    """
+    try:
+        # numpy/scipy and the population grid load on first use, not at startup
+        from .coverage_optimizer import propose_stops
+        
+        return await asyncio.to_thread(
+            propose_stops,
+            k=num_stops,
+            radius_m=coverage_radius_m,
+            bounds=bounds
+        )
+    except ImportError as e:
+        return {
+            "error": f"Coverage optimizer dependencies missing: {str(e)}",
+            "status": "unavailable"
+        }
+    except ValueError as e:
+        return {
+            "error": str(e),
+            "status": "invalid_request"
+        }
+    except Exception as e:
+        return {
+            "error": f"Unexpected error: {str(e)}",
+            "status": "error"
+        }
 
 
 # Tool registry for easy access
 CUSTOM_TOOLS = [
     get_ml_predictions,
     analyze_transport_coverage,
-    get_area_statistics
+    get_area_statistics,
+    propose_new_stops
 ]
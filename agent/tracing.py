@@ -0,0 +1,223 @@
+"""
+Per-Turn Tracing for the Dubai RTA Agent
+Records a span tree for each agent turn (model calls, tool calls, total time)
+and appends it to a local JSONL sink. Opt-in and sampled so it stays cheap under load.
+
+Model spans are derived from ADK runner events. Tool spans are recorded by the
+tool runtime where each call actually runs, via the trace made active for the turn
+with tracer.activate(); tool calls started concurrently therefore keep their own
+start and end times instead of sharing the merged function-response event's.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+_agent_dir = Path(__file__).parent
+
+# Fraction of turns to trace (0 disables tracing, 1 traces every turn)
+TRACE_SAMPLE_RATE = float(os.getenv("AGENT_TRACE_SAMPLE_RATE", "0"))
+TRACE_PATH = Path(os.getenv("AGENT_TRACE_PATH", str(_agent_dir / "traces.jsonl")))
+# Past this size the sink rolls over to <path>.1, so reads stay bounded with uptime
+TRACE_MAX_BYTES = int(float(os.getenv("AGENT_TRACE_MAX_MB", "10")) * 1024 * 1024)
+
+_active_trace: ContextVar[Optional["TurnTrace"]] = ContextVar("active_trace", default=None)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@dataclass
+class Span:
+    """A timed operation within a turn."""
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=_new_id)
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    attributes: dict = field(default_factory=dict)
+
+    def finish(self, end: Optional[float] = None, **attributes) -> None:
+        """Close the span and merge any final attributes."""
+        self.end = end if end is not None else time.time()
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        end = self.end if self.end is not None else time.time()
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class TurnTrace:
+    """Span tree for a single agent turn, built from ADK runner events."""
+
+    def __init__(self, session_id: str, user_message: str = ""):
+        self.trace_id = _new_id()
+        self.session_id = session_id
+        self.root = Span(
+            name="agent_turn",
+            trace_id=self.trace_id,
+            attributes={"message_chars": len(user_message)},
+        )
+        self.spans: list[Span] = [self.root]
+        self._last_mark = self.root.start
+
+    def start_span(self, name: str, start: Optional[float] = None, **attributes) -> Span:
+        """Open a child span of the turn."""
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            parent_id=self.root.span_id,
+            start=start if start is not None else time.time(),
+            attributes=attributes,
+        )
+        self.spans.append(span)
+        return span
+
+    def record_event(self, event: Any) -> None:
+        """Turn an ADK model event into a model_call span."""
+        now = time.time()
+        calls = event.get_function_calls() if hasattr(event, "get_function_calls") else []
+        responses = event.get_function_responses() if hasattr(event, "get_function_responses") else []
+
+        # Function responses are traced by the tool runtime as the calls run
+        if not responses and getattr(event, "author", "user") != "user":
+            # Everything between the previous event and this one was spent waiting on the model
+            usage = getattr(event, "usage_metadata", None)
+            span = self.start_span(
+                "model_call",
+                start=self._last_mark,
+                author=event.author,
+                function_calls=[call.name for call in calls],
+                final=event.is_final_response(),
+            )
+            if usage is not None:
+                span.attributes.update(
+                    prompt_tokens=getattr(usage, "prompt_token_count", None),
+                    output_tokens=getattr(usage, "candidates_token_count", None),
+                    total_tokens=getattr(usage, "total_token_count", None),
+                )
+            span.finish(end=now)
+
+        self._last_mark = now
+
+    @contextmanager
+    def tool_span(self, tool_name: str, arguments: dict):
+        """Time one tool call; the caller sets status/error on the yielded span."""
+        span = self.start_span("tool_call", tool=tool_name, args=arguments)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(status="error", error=str(e) or type(e).__name__)
+            raise
+        if span.end is None:
+            span.finish()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        """Close the root span and mark tool spans still running."""
+        now = time.time()
+        for span in self.spans:
+            if span.end is None and span is not self.root:
+                span.finish(end=now, status="unfinished")
+        if error:
+            self.root.attributes["error"] = error
+        self.root.finish(end=now)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "session_id": self.session_id,
+            "start": self.root.start,
+            "duration_ms": self.root.to_dict()["duration_ms"],
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class Tracer:
+    """Samples turns and appends finished traces to a JSONL file."""
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, path: Path = TRACE_PATH, max_bytes: int = TRACE_MAX_BYTES):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def rotated_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".1")
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def start_turn(self, session_id: str, user_message: str = "") -> Optional[TurnTrace]:
+        """Return a new trace if this turn is sampled, otherwise None."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        return TurnTrace(session_id, user_message)
+
+    @contextmanager
+    def activate(self, trace: Optional[TurnTrace]):
+        """Make trace the one tool calls inside the block (and tasks they start) report to."""
+        token = _active_trace.set(trace)
+        try:
+            yield
+        finally:
+            _active_trace.reset(token)
+
+    def export(self, trace: TurnTrace) -> None:
+        """Append a finished trace as one JSON line, rolling the file over when it is full."""
+        line = json.dumps(trace.to_dict(), default=str) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if self.path.stat().st_size + len(line) > self.max_bytes:
+                    os.replace(self.path, self.rotated_path)
+            except FileNotFoundError:
+                pass
+            with open(self.path, "a", encoding="utf-8") as sink:
+                sink.write(line)
+
+    def read_traces(self, session_id: str, limit: int = 20) -> list[dict]:
+        """Return the most recent traces recorded for a session."""
+        if limit <= 0:
+            return []
+        needle = f'"session_id": {json.dumps(session_id)}'
+        traces: deque[str] = deque(maxlen=limit)
+        # Oldest first, so the deque ends up holding the newest traces
+        for path in (self.rotated_path, self.path):
+            try:
+                with open(path, "r", encoding="utf-8") as sink:
+                    for line in sink:
+                        # Cheap substring filter before paying for a JSON parse
+                        if needle in line:
+                            traces.append(line)
+            except FileNotFoundError:
+                continue
+        return [json.loads(line) for line in traces]
+
+
+def active_trace() -> Optional[TurnTrace]:
+    """The trace of the turn the current task belongs to, if it is sampled and still open."""
+    trace = _active_trace.get()
+    return trace if trace is not None and trace.root.end is None else None
+
+
+# Global tracer instance
+tracer = Tracer()
@@ -1,18 +1,78 @@
+import json
+import os
+
 from flask import Flask, request, jsonify
 import torch
 
+from scripts.feature_store import FeatureStore, SCHEMA_VERSION
+from scripts.train import CONFIG_PATH, MODEL_FEATURES, MODEL_PATH, build_model_from_state_dict
+
 app = Flask(__name__)
 
+# Features and model are loaded once; each request is a row lookup plus one forward pass
+store = None
+store_error = None
+try:
+    store = FeatureStore.load()
+except (FileNotFoundError, ValueError) as e:
+    # Serve 503s until the store is materialized, like a missing model
+    store_error = str(e)
+model = None
+# Positions of the model's inputs within a stored feature row
+model_columns = store.indices(MODEL_FEATURES) if store is not None else None
+if os.path.exists(CONFIG_PATH):
+    with open(CONFIG_PATH) as f:
+        model_config = json.load(f)
+    # Only serve a model trained on the same feature schema and input columns
+    if (
+        model_config.get("schema_version") == SCHEMA_VERSION
+        and model_config.get("feature_names") == list(MODEL_FEATURES)
+    ):
+        model = build_model_from_state_dict(torch.load(MODEL_PATH, map_location="cpu"))
+        model.eval()
+
+
 @app.route('/predict', methods=['POST'])
 def predict():
-    # 1. Get the data from the AI Agent
-    data = request.json
-    
-    # 2. Logic to process data and run it through your model.pth
-    # prediction = model(torch.tensor(data['features']))
-    
+    # 1. Get the data from the AI Agent: a community number, or a point to map to one
+    data = request.get_json(silent=True) or {}
+    if store is None:
+        return jsonify({
+            "status": "error",
+            "error": f"Feature store unavailable ({store_error}); run scripts/feature_store.py",
+        }), 503
+    try:
+        if "comm_num" in data:
+            comm_num = int(data["comm_num"])
+        elif "lat" in data and "lng" in data:
+            comm_num = store.nearest(float(data["lat"]), float(data["lng"]))
+        else:
+            return jsonify({"status": "error", "error": "Send 'comm_num' or 'lat'/'lng'"}), 400
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "error": "'comm_num' must be an integer and 'lat'/'lng' numbers"}), 400
+
+    if comm_num not in store:
+        return jsonify({"status": "error", "error": f"Unknown community {comm_num}"}), 404
+    if model is None:
+        return jsonify({
+            "status": "error",
+            "error": f"No model trained for feature schema v{SCHEMA_VERSION} and the current inputs; run scripts/train.py",
+        }), 503
+
+    # 2. Run the stored feature vector through model.pth
+    with torch.no_grad():
+        features = torch.from_numpy(store.vector(comm_num)[model_columns]).unsqueeze(0)
+        priority = float(model(features).item())
+
     # 3. Send the answer back
-    return jsonify({"status": "success", "priority_score": 0.88})
+    return jsonify({
+        "status": "success",
+        "comm_num": comm_num,
+        "priority_score": priority,
+        "index_score": max(0, min(100, round(priority * 100))),
+        "schema_version": SCHEMA_VERSION,
+    })
+
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000)
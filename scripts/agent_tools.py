@@ -1,19 +1,29 @@
-import requests
+import os
 
-CRUSTDATA_API_KEY = "02324ad48798ebfc23dcdc662c60f46be18dd864"
+from scripts.tool_client import TokenBucket, get_client
 
-# Keep your original PyTorch tool
-def get_busyness_prediction(neighborhood, hour, day_type):
-    url = "http://127.0.0.1:5000/predict"
-    neighborhood_map = {"marina": 0, "downtown": 1, "jvc": 2}
-    n_id = neighborhood_map.get(neighborhood.lower(), 0)
-    payload = {"features": [n_id, hour, day_type, 0.8, 0.5]}
-    response = requests.post(url, json=payload)
-    return response.json() if response.status_code == 200 else "Error"
+CRUSTDATA_API_KEY = os.getenv("CRUSTDATA_API_KEY", "02324ad48798ebfc23dcdc662c60f46be18dd864")
+CRUSTDATA_URL = "https://api.crustdata.com/screener/company/search"
+BUSYNESS_URL = os.getenv("BUSYNESS_API_URL", "http://127.0.0.1:5000/predict")
 
-# Add the new Crustdata tool below it
-def get_neighborhood_business_growth(neighborhood_name):
-    url = "https://api.crustdata.com/screener/company/search"
+# Business signals change slowly, so repeat lookups are served from disk for a week
+CRUSTDATA_CACHE_TTL = float(os.getenv("CRUSTDATA_CACHE_TTL", str(7 * 24 * 3600)))
+BUSYNESS_CACHE_TTL = float(os.getenv("BUSYNESS_CACHE_TTL", "300"))
+
+crustdata_bucket = TokenBucket(rate=float(os.getenv("CRUSTDATA_RATE_PER_SEC", "1")), capacity=5)
+busyness_bucket = TokenBucket(rate=float(os.getenv("BUSYNESS_RATE_PER_SEC", "50")), capacity=50)
+
+# COMM_NUM of each neighborhood in data/dubai.geojson (Marsa Dubai, Burj Khalifa, Al Barsha South Fourth)
+neighborhood_map = {"marina": 392, "downtown": 345, "jvc": 681}
+
+
+def _busyness_request(neighborhood):
+    # Features come from the feature store on the server; only the key is sent
+    comm_num = neighborhood_map.get(neighborhood.lower(), 392)
+    return str(comm_num), {"comm_num": comm_num}
+
+
+def _crustdata_request(neighborhood_name):
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Token {CRUSTDATA_API_KEY}"
@@ -28,5 +38,41 @@ def get_neighborhood_business_growth(neighborhood_name):
         },
         "count": 10
     }
-    response = requests.post(url, headers=headers, json=payload)
-    return response.json() if response.status_code == 200 else None
\ No newline at end of file
+    return neighborhood_name.strip().lower(), payload, headers
+
+
+# Keep your original PyTorch tool
+def get_busyness_prediction(neighborhood, hour=None, day_type=None):
+    """Priority score for a neighborhood.
+
+    The model scores communities from their stored features only, so the score
+    does not depend on time of day; hour and day_type are accepted for old
+    callers and ignored.
+    """
+    key, payload = _busyness_request(neighborhood)
+    result = get_client().post_json("busyness", key, BUSYNESS_URL, payload, BUSYNESS_CACHE_TTL, busyness_bucket)
+    return result if result is not None else "Error"
+
+
+async def get_busyness_prediction_async(neighborhood, hour=None, day_type=None):
+    """Async get_busyness_prediction; hour and day_type are ignored."""
+    key, payload = _busyness_request(neighborhood)
+    result = await get_client().post_json_async(
+        "busyness", key, BUSYNESS_URL, payload, BUSYNESS_CACHE_TTL, busyness_bucket
+    )
+    return result if result is not None else "Error"
+
+
+# Add the new Crustdata tool below it
+def get_neighborhood_business_growth(neighborhood_name):
+    key, payload, headers = _crustdata_request(neighborhood_name)
+    return get_client().post_json(
+        "crustdata", key, CRUSTDATA_URL, payload, CRUSTDATA_CACHE_TTL, crustdata_bucket, headers=headers
+    )
+
+
+async def get_neighborhood_business_growth_async(neighborhood_name):
+    key, payload, headers = _crustdata_request(neighborhood_name)
+    return await get_client().post_json_async(
+        "crustdata", key, CRUSTDATA_URL, payload, CRUSTDATA_CACHE_TTL, crustdata_bucket, headers=headers
+    )
@@ -0,0 +1,164 @@
+"""
+CPU inference benchmark for the priority model.
+
+Loads models/model.pth (plus any exported TorchScript variants in models/*.pt) and
+measures latency percentiles and throughput across batch sizes, torch thread counts
+and execution modes (eager, TorchScript, dynamic int8 quantization), along with
+each variant's memory footprint. Emits a JSON report so runs can be compared when
+sizing /predict replicas.
+
+Usage (from the repo root):
+    python scripts/bench_inference.py --output bench_inference.json
+    python scripts/bench_inference.py --export      # also write models/model_scripted.pt
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+import torch.nn as nn
+
+from scripts.train import MODEL_DIR, MODEL_PATH, build_model_from_state_dict
+
+DEFAULT_BATCH_SIZES = (1, 8, 64, 256, 1024)
+
+
+def default_thread_counts():
+    cores = os.cpu_count() or 1
+    return sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+
+
+def serialized_bytes(model):
+    buffer = io.BytesIO()
+    if isinstance(model, torch.jit.ScriptModule):
+        torch.jit.save(model, buffer)
+    else:
+        torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def parameter_bytes(model):
+    tensors = list(model.parameters()) + list(model.buffers())
+    # Dynamic int8 Linear layers keep their weights in packed params, not parameters()
+    for module in model.modules():
+        packed = getattr(module, "_packed_params", None)
+        if hasattr(packed, "_weight_bias"):
+            tensors.extend(t for t in packed._weight_bias() if t is not None)
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def load_variants(export=False):
+    """Every execution mode to compare, keyed by name."""
+    eager = build_model_from_state_dict(torch.load(MODEL_PATH, map_location="cpu")).eval()
+    variants = {
+        "eager": eager,
+        "scripted": torch.jit.script(eager),
+        "quantized_dynamic_int8": torch.ao.quantization.quantize_dynamic(eager, {nn.Linear}, dtype=torch.qint8),
+    }
+    exported_path = os.path.join(MODEL_DIR, "model_scripted.pt")
+    if export:
+        torch.jit.save(variants["scripted"], exported_path)
+    # Previously exported TorchScript files (the one just written is "scripted" already)
+    for path in sorted(glob.glob(os.path.join(MODEL_DIR, "*.pt"))):
+        if export and os.path.samefile(path, exported_path):
+            continue
+        variants[f"exported:{os.path.basename(path)}"] = torch.jit.load(path, map_location="cpu").eval()
+    return variants, eager.state_dict()
+
+
+def time_variant(model, batch, min_seconds, warmup):
+    """Latency samples (seconds) for repeated forward passes on one batch."""
+    with torch.inference_mode():
+        for _ in range(warmup):
+            model(batch)
+        samples = []
+        deadline = time.perf_counter() + min_seconds
+        while time.perf_counter() < deadline or len(samples) < 20:
+            start = time.perf_counter()
+            model(batch)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(sorted_samples, q):
+    index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU inference benchmark for models/model.pth")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--threads", type=int, nargs="+", default=default_thread_counts())
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="measuring time per cell")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--export", action="store_true", help="write models/model_scripted.pt first")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    variants, state_dict = load_variants(export=args.export)
+    input_dim = next(v for k, v in state_dict.items() if k.endswith("weight")).shape[1]
+
+    report = {
+        "environment": {
+            "torch": torch.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "model": {"path": MODEL_PATH, "input_dim": input_dim},
+        "memory": {
+            name: {"serialized_bytes": serialized_bytes(model), "parameter_bytes": parameter_bytes(model)}
+            for name, model in variants.items()
+        },
+        "results": [],
+    }
+
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for batch_size in args.batch_sizes:
+            # Standardized features are roughly N(0, 1), like the feature store's output
+            batch = torch.randn(batch_size, input_dim)
+            for name, model in variants.items():
+                samples = sorted(time_variant(model, batch, args.min_seconds, args.warmup))
+                mean = statistics.fmean(samples)
+                report["results"].append({
+                    "variant": name,
+                    "threads": threads,
+                    "batch_size": batch_size,
+                    "iterations": len(samples),
+                    "latency_ms": {
+                        "mean": round(mean * 1e3, 4),
+                        "p50": round(percentile(samples, 0.50) * 1e3, 4),
+                        "p95": round(percentile(samples, 0.95) * 1e3, 4),
+                        "p99": round(percentile(samples, 0.99) * 1e3, 4),
+                    },
+                    "throughput_rows_per_s": round(batch_size / mean, 1),
+                })
+                print(f"{name:>28} threads={threads:<3} batch={batch_size:<5} "
+                      f"p50={percentile(samples, 0.5) * 1e3:.4f}ms "
+                      f"{batch_size / mean:,.0f} rows/s", file=sys.stderr)
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["memory"]["process_peak_rss_bytes"] = max_rss if sys.platform == "darwin" else max_rss * 1024
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Startup-time benchmark for the agent API server.
+
+Measures, in fresh interpreters, how long `import agent.api_server` takes and,
+optionally, how long uvicorn needs before /healthz (liveness) and /readyz
+(readiness) answer. Prints a JSON summary.
+
+Usage (from the repo root):
+    python scripts/bench_startup.py --runs 5
+    python scripts/bench_startup.py --runs 3 --serve --port 8091
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); "
+    "import agent.api_server; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import() -> float:
+    """Seconds to import agent.api_server in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # The import prints startup banners; the timing is the last line
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _wait_for(url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} did not become healthy in time")
+
+
+def measure_serve(port: int, timeout: float = 60.0) -> dict:
+    """Seconds from process spawn until /healthz and /readyz return 200."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "agent.api_server:app", "--port", str(port)],
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        live = _wait_for(f"{base}/healthz", start + timeout)
+        ready = _wait_for(f"{base}/readyz", start + timeout)
+        return {"liveness_s": live - start, "readiness_s": ready - start}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "runs": len(samples),
+        "min_s": round(min(samples), 4),
+        "median_s": round(statistics.median(samples), 4),
+        "max_s": round(max(samples), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn liveness/readiness")
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+
+    report = {"import": summarize([measure_import() for _ in range(args.runs)])}
+
+    if args.serve:
+        serves = [measure_serve(args.port) for _ in range(args.runs)]
+        report["liveness"] = summarize([s["liveness_s"] for s in serves])
+        report["readiness"] = summarize([s["readiness_s"] for s in serves])
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Per-community feature store shared by training (scripts/train.py) and serving (app.py).
+
+Features are materialized once into a compact .npz keyed by COMM_NUM, so serving is
+a row lookup with no per-request feature engineering and no train/serve skew.
+
+Usage (from the repo root):
+    python scripts/feature_store.py        # (re)build data/feature_store.npz
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = REPO_ROOT / "data"
+STORE_PATH = Path(os.getenv("FEATURE_STORE_PATH", str(DATA_DIR / "feature_store.npz")))
+
+# Bump SCHEMA_VERSION whenever FEATURE_NAMES or their definitions change
+SCHEMA_VERSION = 1
+POPULATION_YEARS = (2018, 2019, 2020, 2021, 2022)
+FEATURE_NAMES = (
+    *(f"population_{year}" for year in POPULATION_YEARS),
+    "population_growth_rate",  # compound annual growth over POPULATION_YEARS
+    "area_km2",
+    "population_density",      # latest population per km2 of SHAPE_AREA
+    "stop_count",              # distinct stops inside the community polygon
+    "route_count",             # distinct routes (name + direction) serving those stops
+    "route_frequency",         # scheduled services per hour across those routes
+)
+
+
+class FeatureStore:
+    """Feature matrix with one row per community, looked up by COMM_NUM."""
+
+    def __init__(
+        self,
+        comm_num: np.ndarray,
+        features: np.ndarray,
+        centroids: np.ndarray,
+        feature_mean: np.ndarray,
+        feature_std: np.ndarray,
+        feature_names: tuple = FEATURE_NAMES,
+        schema_version: int = SCHEMA_VERSION,
+    ):
+        self.comm_num = comm_num.astype(np.int32)
+        self.features = features.astype(np.float32)
+        self.centroids = centroids.astype(np.float64)  # (lat, lng) per row
+        self.feature_mean = feature_mean.astype(np.float32)
+        self.feature_std = feature_std.astype(np.float32)
+        self.feature_names = tuple(feature_names)
+        self.schema_version = int(schema_version)
+        self._row = {int(c): i for i, c in enumerate(self.comm_num)}
+
+    def __len__(self) -> int:
+        return len(self.comm_num)
+
+    def __contains__(self, comm_num) -> bool:
+        return int(comm_num) in self._row
+
+    @property
+    def normalized(self) -> np.ndarray:
+        """All rows standardized with the stored mean/std (the model's input)."""
+        return (self.features - self.feature_mean) / self.feature_std
+
+    def vector(self, comm_num, normalized: bool = True) -> np.ndarray:
+        """Feature row for one community."""
+        row = self.features[self._row[int(comm_num)]]
+        return (row - self.feature_mean) / self.feature_std if normalized else row
+
+    def column(self, name: str) -> np.ndarray:
+        return self.features[:, self.feature_names.index(name)]
+
+    def indices(self, names) -> list[int]:
+        """Column positions of the named features, in the given order."""
+        return [self.feature_names.index(name) for name in names]
+
+    def nearest(self, latitude: float, longitude: float) -> int:
+        """COMM_NUM of the community whose centroid is closest to a point."""
+        # Scale longitude so distances are roughly isotropic at Dubai's latitude
+        d_lat = self.centroids[:, 0] - latitude
+        d_lng = (self.centroids[:, 1] - longitude) * np.cos(np.radians(latitude))
+        return int(self.comm_num[np.argmin(d_lat * d_lat + d_lng * d_lng)])
+
+    def save(self, path: Path = STORE_PATH) -> None:
+        np.savez_compressed(
+            path,
+            comm_num=self.comm_num,
+            features=self.features,
+            centroids=self.centroids,
+            feature_mean=self.feature_mean,
+            feature_std=self.feature_std,
+            feature_names=np.array(self.feature_names),
+            schema_version=np.array(self.schema_version),
+        )
+
+    @classmethod
+    def load(cls, path: Path = STORE_PATH) -> "FeatureStore":
+        """Load a materialized store, refusing one built with a different schema."""
+        with np.load(path) as data:
+            store = cls(
+                comm_num=data["comm_num"],
+                features=data["features"],
+                centroids=data["centroids"],
+                feature_mean=data["feature_mean"],
+                feature_std=data["feature_std"],
+                feature_names=tuple(str(n) for n in data["feature_names"]),
+                schema_version=int(data["schema_version"]),
+            )
+        if store.schema_version != SCHEMA_VERSION or store.feature_names != FEATURE_NAMES:
+            raise ValueError(
+                f"Feature store at {path} has schema v{store.schema_version}, expected "
+                f"v{SCHEMA_VERSION}; rebuild it with: python scripts/feature_store.py"
+            )
+        return store
+
+
+def _population_by_year(path: Path):
+    import pandas as pd
+
+    pop_df = pd.read_csv(path)
+    # "415-AL KHAIRAN FIRST" -> 415
+    pop_df["comm_num"] = pop_df["communitynumber_communityname_en"].str.split("-").str[0].str.strip().astype(int)
+    return pop_df.pivot_table(index="comm_num", columns="year", values="population", aggfunc="sum")
+
+
+def _stop_features(stops_path: Path, communities_gdf):
+    import geopandas as gpd
+    import pandas as pd
+    from shapely.geometry import Point
+
+    stops_df = pd.read_csv(stops_path)
+    # Keep the latest snapshot of every (route, direction, stop) row
+    stops_df["report_date"] = pd.to_datetime(stops_df["report_date"], format="%d/%m/%Y", errors="coerce")
+    stops_df = stops_df.sort_values("report_date").drop_duplicates(
+        ["route_name", "route_direction", "stop_id"], keep="last"
+    )
+    geometry = [Point(xy) for xy in zip(stops_df["stop_location_longitude"], stops_df["stop_location_latitude"])]
+    stops_gdf = gpd.GeoDataFrame(stops_df, geometry=geometry, crs=communities_gdf.crs)
+    merged = gpd.sjoin(stops_gdf, communities_gdf[["COMM_NUM", "geometry"]], how="inner", predicate="intersects")
+    merged["comm_num"] = merged["COMM_NUM"].astype(int)
+
+    # route_frequency is the headway in minutes; convert each route to services per hour
+    headway = pd.to_numeric(merged["route_frequency"], errors="coerce")
+    merged["services_per_hour"] = (60.0 / headway.where(headway > 0)).fillna(0.0)
+    routes = merged.drop_duplicates(["comm_num", "route_name", "route_direction"])
+
+    return pd.DataFrame({
+        "stop_count": merged.groupby("comm_num")["stop_id"].nunique(),
+        "route_count": routes.groupby("comm_num").size(),
+        "route_frequency": routes.groupby("comm_num")["services_per_hour"].sum(),
+    })
+
+
+def materialize(data_dir: Path = DATA_DIR, path: Path = STORE_PATH) -> FeatureStore:
+    """Build the feature store from the raw data files and save it."""
+    import geopandas as gpd
+
+    communities_gdf = gpd.read_file(data_dir / "dubai.geojson")
+    communities_gdf["comm_num"] = communities_gdf["COMM_NUM"].astype(int)
+    communities = communities_gdf.set_index("comm_num").sort_index()
+
+    population = _population_by_year(data_dir / "Population_By_Community.csv")
+    population = population.reindex(index=communities.index, columns=list(POPULATION_YEARS)).fillna(0.0)
+    stops = _stop_features(data_dir / "Public_Transportation_Routes_Stops.csv", communities_gdf)
+    stops = stops.reindex(communities.index).fillna(0.0)
+
+    first = population[POPULATION_YEARS[0]].to_numpy(dtype=np.float64)
+    last = population[POPULATION_YEARS[-1]].to_numpy(dtype=np.float64)
+    years = POPULATION_YEARS[-1] - POPULATION_YEARS[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(first > 0, (last / first) ** (1.0 / years) - 1.0, 0.0)
+    area_km2 = communities["SHAPE_AREA"].astype(float).to_numpy() / 1e6
+    density = np.divide(last, area_km2, out=np.zeros_like(last), where=area_km2 > 0)
+
+    features = np.column_stack([
+        population.to_numpy(dtype=np.float64),
+        growth,
+        area_km2,
+        density,
+        stops["stop_count"].to_numpy(),
+        stops["route_count"].to_numpy(),
+        stops["route_frequency"].to_numpy(),
+    ]).astype(np.float32)
+
+    std = features.std(axis=0)
+    store = FeatureStore(
+        comm_num=communities.index.to_numpy(),
+        features=features,
+        centroids=communities[["Latitude", "Longitude"]].astype(float).to_numpy(),
+        feature_mean=features.mean(axis=0),
+        feature_std=np.where(std > 0, std, 1.0),
+    )
+    store.save(path)
+    return store
+
+
+if __name__ == "__main__":
+    store = materialize()
+    print(f"SUCCESS: {len(store)} communities x {len(FEATURE_NAMES)} features "
+          f"(schema v{SCHEMA_VERSION}) written to {STORE_PATH}")
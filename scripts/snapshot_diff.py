@@ -0,0 +1,255 @@
+"""
+Streaming change log for RTA stop/route snapshots.
+
+Snapshot files (same columns as data/Public_Transportation_Routes_Stops.csv) are
+read in fixed-size chunks with the csv module. Each report_date is treated as one
+snapshot and diffed against the previous one, keyed by stop_id and
+(route_name, route_direction):
+
+    stop_added / stop_removed                 a stop appears in / disappears from the network
+    route_stop_added / route_stop_removed     a route starts / stops serving a stop
+    route_added / route_removed               a whole route appears / disappears
+    frequency_changed                         a route's route_frequency changed (both values known)
+
+Changes are appended as compact JSON lines to data/stop_changes.jsonl. The latest
+network state is kept in data/stop_snapshot_state.json.gz so later runs only diff
+snapshots newer than the last one processed.
+
+A file may hold several snapshots in any row order (the bundled CSV lists the
+newest first). A first pass only collects the report_dates; each new snapshot is
+then folded from its own rows and diffed before the next one is built, so at most
+two networks are held in memory at once, whatever the size or number of files.
+
+Some published snapshots only cover part of the network (the 31/10/2022 one in the
+bundled CSV lists 131 rows). By default (--partial auto) a snapshot listing fewer
+than PARTIAL_ROUTE_FRACTION of the previous snapshot's routes is treated as
+partial: routes missing from it are carried over from the previous state instead
+of being reported as removed. --partial always / never force either behaviour.
+
+Usage (from the repo root):
+    python scripts/snapshot_diff.py ingest data/Public_Transportation_Routes_Stops.csv
+    python scripts/snapshot_diff.py ingest --partial always data/new_snapshot.csv
+    python scripts/snapshot_diff.py query --stop-id GG11
+    python scripts/snapshot_diff.py query --type frequency_changed --since 2021-01-01
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+from datetime import datetime
+
+CHANGE_LOG_PATH = os.path.join("data", "stop_changes.jsonl")
+STATE_PATH = os.path.join("data", "stop_snapshot_state.json.gz")
+DEFAULT_CHUNK_SIZE = 5000
+# A snapshot listing fewer routes than this share of the previous one is partial
+PARTIAL_ROUTE_FRACTION = 0.5
+
+
+def iter_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of at most chunk_size CSV rows."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _snapshot_key(report_date):
+    """dd/mm/yyyy -> yyyy-mm-dd so snapshots sort chronologically."""
+    try:
+        return datetime.strptime(report_date, "%d/%m/%Y").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_frequency(value):
+    """route_frequency as a number; 'null', blanks and junk mean unknown (None)."""
+    try:
+        frequency = float(value)
+    except (TypeError, ValueError):
+        return None
+    if frequency != frequency:  # NaN
+        return None
+    return int(frequency) if frequency.is_integer() else frequency
+
+
+def _empty_network():
+    return {"stops": {}, "routes": {}, "route_stops": set()}
+
+
+def scan_snapshots(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return the snapshots (yyyy-mm-dd) present in a file, oldest first."""
+    snapshots = set()
+    for chunk in iter_chunks(path, chunk_size):
+        for row in chunk:
+            snapshot = _snapshot_key(row.get("report_date"))
+            if snapshot is not None:
+                snapshots.add(snapshot)
+    return sorted(snapshots)
+
+
+def build_network(path, snapshot, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fold the rows of one snapshot into a compact network."""
+    network = _empty_network()
+    for chunk in iter_chunks(path, chunk_size):
+        for row in chunk:
+            stop_id = (row.get("stop_id") or "").strip()
+            if not stop_id or _snapshot_key(row.get("report_date")) != snapshot:
+                continue
+            route = f"{row.get('route_name', '')}|{row.get('route_direction', '')}"
+            network["stops"][stop_id] = row.get("stop_name") or ""
+            frequency = _parse_frequency(row.get("route_frequency"))
+            # A row without a frequency doesn't erase one another row of the route gave
+            if frequency is not None or route not in network["routes"]:
+                network["routes"][route] = frequency
+            network["route_stops"].add((route, stop_id))
+    return network
+
+
+def is_partial(previous, current, fraction=PARTIAL_ROUTE_FRACTION):
+    """True when current lists far fewer routes than the previous network."""
+    return bool(previous["routes"]) and len(current["routes"]) < fraction * len(previous["routes"])
+
+
+def diff_networks(previous, current, snapshot):
+    """Yield change records between two consecutive networks."""
+    for stop_id in current["stops"].keys() - previous["stops"].keys():
+        yield {"snapshot": snapshot, "type": "stop_added", "stop_id": stop_id, "stop_name": current["stops"][stop_id]}
+    for stop_id in previous["stops"].keys() - current["stops"].keys():
+        yield {"snapshot": snapshot, "type": "stop_removed", "stop_id": stop_id, "stop_name": previous["stops"][stop_id]}
+
+    for route in current["routes"].keys() - previous["routes"].keys():
+        yield {"snapshot": snapshot, "type": "route_added", "route": route, "frequency": current["routes"][route]}
+    for route in previous["routes"].keys() - current["routes"].keys():
+        yield {"snapshot": snapshot, "type": "route_removed", "route": route, "frequency": previous["routes"][route]}
+    for route in current["routes"].keys() & previous["routes"].keys():
+        old, new = previous["routes"][route], current["routes"][route]
+        # An unknown frequency on either side is missing data, not a change
+        if old is not None and new is not None and old != new:
+            yield {"snapshot": snapshot, "type": "frequency_changed", "route": route, "old": old, "new": new}
+
+    for route, stop_id in current["route_stops"] - previous["route_stops"]:
+        yield {"snapshot": snapshot, "type": "route_stop_added", "route": route, "stop_id": stop_id}
+    for route, stop_id in previous["route_stops"] - current["route_stops"]:
+        yield {"snapshot": snapshot, "type": "route_stop_removed", "route": route, "stop_id": stop_id}
+
+
+def overlay_network(previous, current):
+    """Carry routes absent from a partial snapshot over from the previous network."""
+    carried = {(route, stop_id) for route, stop_id in previous["route_stops"] if route not in current["routes"]}
+    route_stops = carried | current["route_stops"]
+    served = {stop_id for _, stop_id in route_stops}
+    stops = {stop_id: name for stop_id, name in previous["stops"].items() if stop_id in served}
+    stops.update(current["stops"])
+    routes = {route: freq for route, freq in previous["routes"].items() if route not in current["routes"]}
+    routes.update(current["routes"])
+    return {"stops": stops, "routes": routes, "route_stops": route_stops}
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return None, _empty_network()
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        state = json.load(f)
+    network = {
+        "stops": state["stops"],
+        # Older state files stored frequencies as raw CSV strings
+        "routes": {route: _parse_frequency(freq) for route, freq in state["routes"].items()},
+        "route_stops": {tuple(pair) for pair in state["route_stops"]},
+    }
+    return state["snapshot"], network
+
+
+def save_state(snapshot, network, path=STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump({
+            "snapshot": snapshot,
+            "stops": network["stops"],
+            "routes": network["routes"],
+            "route_stops": sorted(network["route_stops"]),
+        }, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def ingest(paths, log_path=CHANGE_LOG_PATH, state_path=STATE_PATH, chunk_size=DEFAULT_CHUNK_SIZE, partial="auto"):
+    """Diff every snapshot newer than the saved state and append the changes."""
+    last_snapshot, previous = load_state(state_path)
+    counts = {}
+    with open(log_path, "a", encoding="utf-8") as log:
+        for path in paths:
+            for snapshot in scan_snapshots(path, chunk_size):
+                if last_snapshot is not None and snapshot <= last_snapshot:
+                    continue
+                current = build_network(path, snapshot, chunk_size)
+                # The very first snapshot is the baseline, not a change
+                if last_snapshot is not None:
+                    if partial == "always" or (partial == "auto" and is_partial(previous, current)):
+                        print(f"NOTE: {snapshot} lists {len(current['routes'])} of {len(previous['routes'])} routes; "
+                              f"treating it as a partial snapshot")
+                        current = overlay_network(previous, current)
+                    for change in diff_networks(previous, current, snapshot):
+                        log.write(json.dumps(change, separators=(",", ":")) + "\n")
+                        counts[change["type"]] = counts.get(change["type"], 0) + 1
+                previous, last_snapshot = current, snapshot
+    if last_snapshot is not None:
+        save_state(last_snapshot, previous, state_path)
+    return last_snapshot, counts
+
+
+def _route_matches(change_route, route):
+    """'12' matches '12|...' in either direction; 'name|direction' matches exactly."""
+    return change_route == route or change_route.startswith(route + "|")
+
+
+def iter_changes(log_path=CHANGE_LOG_PATH, since=None, stop_id=None, route=None, change_type=None):
+    """Stream change records matching the given filters."""
+    if not os.path.exists(log_path):
+        return
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            change = json.loads(line)
+            if since and change["snapshot"] < since:
+                continue
+            if stop_id and change.get("stop_id") != stop_id:
+                continue
+            if route and not _route_matches(change.get("route", ""), route):
+                continue
+            if change_type and change["type"] != change_type:
+                continue
+            yield change
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff stop/route snapshots into a change log")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="diff new snapshot files into the change log")
+    ingest_parser.add_argument("files", nargs="+")
+    ingest_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ingest_parser.add_argument("--partial", choices=("auto", "always", "never"), default="auto",
+                               help="whether snapshots only cover the routes they list (auto: detect)")
+
+    query_parser = subparsers.add_parser("query", help="print matching change records")
+    query_parser.add_argument("--since", help="yyyy-mm-dd")
+    query_parser.add_argument("--stop-id")
+    query_parser.add_argument("--route", help="route name (optionally 'name|direction')")
+    query_parser.add_argument("--type", dest="change_type")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        snapshot, counts = ingest(args.files, chunk_size=args.chunk_size, partial=args.partial)
+        print(f"SUCCESS: network state at snapshot {snapshot}; changes appended: {counts or 'none'}")
+    else:
+        for change in iter_changes(since=args.since, stop_id=args.stop_id, route=args.route,
+                                   change_type=args.change_type):
+            print(json.dumps(change, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
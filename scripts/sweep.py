@@ -0,0 +1,163 @@
+"""
+Parallel hyperparameter sweep for the priority model.
+
+Trains every configuration in a grid across CPU cores with a process pool,
+each worker limited to a few torch intra-op threads so workers don't fight
+over cores. Trials stop early when validation loss stops improving. Metrics
+and wall time per trial go to models/sweep_results.jsonl, and the best model
+is saved to models/model.pth with its config in models/model_config.json.
+
+Usage (from the repo root):
+    python scripts/sweep.py --workers 8 --threads-per-worker 1
+"""
+import argparse
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from scripts.train import MODEL_DIR, MODEL_FEATURES, build_model, load_training_data, save_model
+
+RESULTS_PATH = os.path.join(MODEL_DIR, "sweep_results.jsonl")
+
+SEARCH_SPACE = {
+    "hidden_sizes": [(8,), (16,), (32,), (32, 16), (64, 32)],
+    "lr": [0.001, 0.003, 0.01, 0.03],
+    "weight_decay": [0.0, 1e-4, 1e-3],
+}
+
+# Per-worker state, filled by _init_worker
+_data = {}
+
+
+def grid(space=SEARCH_SPACE):
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def _init_worker(threads, val_fraction, seed):
+    # Bound intra-op parallelism so N workers x threads stays within the cores
+    torch.set_num_threads(threads)
+    store, X, y = load_training_data()
+    generator = torch.Generator().manual_seed(seed)
+    order = torch.randperm(len(X), generator=generator)
+    n_val = max(1, int(len(X) * val_fraction))
+    val_idx, train_idx = order[:n_val], order[n_val:]
+    _data.update(
+        X_train=X[train_idx], y_train=y[train_idx],
+        X_val=X[val_idx], y_val=y[val_idx],
+        schema_version=store.schema_version,
+        feature_names=list(MODEL_FEATURES),
+        seed=seed,
+    )
+
+
+def run_trial(trial_id, config, max_epochs, patience):
+    start = time.perf_counter()
+    torch.manual_seed(_data["seed"] + trial_id)
+    model = build_model(_data["X_train"].shape[1], config["hidden_sizes"])
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=config["lr"], weight_decay=config["weight_decay"])
+
+    best_val, best_epoch, best_state = float("inf"), 0, None
+    for epoch in range(max_epochs):
+        model.train()
+        optimizer.zero_grad()
+        loss = criterion(model(_data["X_train"]), _data["y_train"])
+        loss.backward()
+        optimizer.step()
+
+        model.eval()
+        with torch.no_grad():
+            val_loss = criterion(model(_data["X_val"]), _data["y_val"]).item()
+        if val_loss < best_val:
+            best_val, best_epoch = val_loss, epoch
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        elif epoch - best_epoch >= patience:
+            break
+
+    # Ship the weights back as bytes; the models are tiny
+    buffer = io.BytesIO()
+    torch.save(best_state, buffer)
+    return {
+        "trial_id": trial_id,
+        "config": {**config, "hidden_sizes": list(config["hidden_sizes"])},
+        "best_val_loss": best_val,
+        "train_loss": loss.item(),
+        "best_epoch": best_epoch + 1,
+        "epochs_run": epoch + 1,
+        "stopped_early": epoch + 1 < max_epochs,
+        "wall_time_s": round(time.perf_counter() - start, 3),
+        "pid": os.getpid(),
+        "schema_version": _data["schema_version"],
+        "feature_names": _data["feature_names"],
+    }, buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for scripts/train.py")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--max-epochs", type=int, default=2000)
+    parser.add_argument("--patience", type=int, default=100)
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configs = list(grid())
+    print(f"Sweeping {len(configs)} configs on {args.workers} workers "
+          f"x {args.threads_per_worker} threads...")
+    os.makedirs(MODEL_DIR, exist_ok=True)
+
+    sweep_start = time.perf_counter()
+    best = None
+    # spawn: forked children would inherit torch's thread pools from the parent
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(args.threads_per_worker, args.val_fraction, args.seed),
+    ) as pool, open(RESULTS_PATH, "w") as results:
+        futures = [
+            pool.submit(run_trial, trial_id, config, args.max_epochs, args.patience)
+            for trial_id, config in enumerate(configs)
+        ]
+        for future in as_completed(futures):
+            metrics, weights = future.result()
+            results.write(json.dumps(metrics) + "\n")
+            results.flush()
+            print(f"Trial {metrics['trial_id']:3d} {metrics['config']} "
+                  f"val={metrics['best_val_loss']:.5f} epochs={metrics['epochs_run']} "
+                  f"{metrics['wall_time_s']:.2f}s")
+            if best is None or metrics["best_val_loss"] < best[0]["best_val_loss"]:
+                best = (metrics, weights)
+
+    metrics, weights = best
+    state_dict = torch.load(io.BytesIO(weights))
+    model = build_model(len(metrics["feature_names"]), metrics["config"]["hidden_sizes"])
+    model.load_state_dict(state_dict)
+    save_model(model, {
+        "schema_version": metrics["schema_version"],
+        "feature_names": metrics["feature_names"],
+        **metrics["config"],
+        "epochs": metrics["best_epoch"],
+        "val_loss": metrics["best_val_loss"],
+        "sweep_trial_id": metrics["trial_id"],
+    })
+    print(f"Best trial {metrics['trial_id']} {metrics['config']} val={metrics['best_val_loss']:.5f}; "
+          f"sweep took {time.perf_counter() - sweep_start:.1f}s. Saved to {MODEL_DIR}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import csv
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.snapshot_diff import build_network, diff_networks, ingest
+
+FIELDS = ["report_date", "route_name", "route_direction", "route_frequency", "stop_name", "stop_id"]
+
+
+def _write_snapshots(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(zip(FIELDS, row)))
+
+
+def test_null_frequency_is_unknown():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshots.csv")
+        _write_snapshots(path, [
+            ("31/12/2020", "8", "1", "20", "Gold Souq", "A1"),
+            ("31/12/2020", "9", "1", "15", "Gold Souq", "A1"),
+            ("31/12/2021", "8", "1", "null", "Gold Souq", "A1"),
+            ("31/12/2021", "9", "1", "30", "Gold Souq", "A1"),
+            ("31/12/2021", "10", "1", "null", "Gold Souq", "A1"),
+        ])
+        network = build_network(path, "2021-12-31")
+        assert network["routes"] == {"8|1": None, "9|1": 30, "10|1": None}
+
+        changes = list(diff_networks(build_network(path, "2020-12-31"), network, "2021-12-31"))
+        frequency_changes = [c for c in changes if c["type"] == "frequency_changed"]
+        # 20 -> null is missing data; only 15 -> 30 is a real change
+        assert frequency_changes == [
+            {"snapshot": "2021-12-31", "type": "frequency_changed", "route": "9|1", "old": 15, "new": 30}
+        ]
+        added = [c for c in changes if c["type"] == "route_added"]
+        assert added == [{"snapshot": "2021-12-31", "type": "route_added", "route": "10|1", "frequency": None}]
+
+        log_path = os.path.join(tmp, "changes.jsonl")
+        ingest([path], log_path=log_path, state_path=os.path.join(tmp, "state.json.gz"))
+        with open(log_path, encoding="utf-8") as f:
+            logged = [json.loads(line) for line in f]
+        assert "null" not in {str(c.get("frequency")) for c in logged} | {str(c.get("new")) for c in logged}
+
+
+if __name__ == "__main__":
+    test_null_frequency_is_unknown()
+    print("snapshot_diff: null frequencies handled")
@@ -0,0 +1,218 @@
+"""
+Shared HTTP plumbing for the agent tools in scripts/agent_tools.py.
+
+- One pooled requests.Session (sync) and one httpx.AsyncClient (async), reused across calls
+- A persistent on-disk response cache (SQLite) with a TTL per entry
+- Token-bucket rate limiting per upstream API
+- Offline record/replay: TOOLS_HTTP_MODE=record saves responses to a cassette
+  file, TOOLS_HTTP_MODE=replay serves only from it and never touches the network
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+import requests
+
+_scripts_dir = Path(__file__).parent
+
+HTTP_MODE = os.getenv("TOOLS_HTTP_MODE", "live")  # live | record | replay
+CACHE_PATH = Path(os.getenv("TOOLS_CACHE_PATH", str(_scripts_dir / ".cache" / "tool_responses.db")))
+CASSETTE_PATH = Path(os.getenv("TOOLS_CASSETTE_PATH", str(_scripts_dir / "cassettes" / "tool_responses.json")))
+HTTP_TIMEOUT = float(os.getenv("TOOLS_HTTP_TIMEOUT", "10"))
+
+
+class TokenBucket:
+    """Allow `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class ResponseCache:
+    """SQLite-backed JSON response cache that survives restarts."""
+
+    def __init__(self, path: Path = CACHE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " namespace TEXT, key TEXT, body TEXT, expires_at REAL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_expires_idx ON responses (expires_at)")
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, expires_at FROM responses WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, body: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (namespace, key, body, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(body), now + ttl),
+            )
+            # Opportunistic sweep keeps the cache file from growing without bound
+            self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+
+
+class Cassette:
+    """JSON file of recorded responses used for offline replay."""
+
+    def __init__(self, path: Path = CASSETTE_PATH):
+        self.path = path
+        self._entries: dict[str, Any] = json.loads(path.read_text()) if path.exists() else {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        return self._entries.get(f"{namespace}:{key}")
+
+    def record(self, namespace: str, key: str, body: Any) -> None:
+        with self._lock:
+            self._entries[f"{namespace}:{key}"] = body
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self._entries, indent=2, sort_keys=True))
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class ToolHTTPClient:
+    """Cached, rate-limited JSON POSTs shared by the sync and async tools."""
+
+    def __init__(self, mode: str = HTTP_MODE, timeout: float = HTTP_TIMEOUT):
+        self.mode = mode
+        self.timeout = timeout
+        self.cache = ResponseCache()
+        self.cassette = Cassette() if mode in ("record", "replay") else None
+        self._session: Optional[requests.Session] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._async_client
+
+    def _lookup(self, namespace: str, key: str) -> Optional[Any]:
+        if self.mode == "replay":
+            body = self.cassette.get(namespace, key)
+            if body is None:
+                raise ReplayMiss(f"No recorded response for {namespace}:{key}")
+            return body
+        if self.mode == "live":
+            return self.cache.get(namespace, key)
+        return None
+
+    def _store(self, namespace: str, key: str, body: Any, ttl: float) -> None:
+        self.cache.set(namespace, key, body, ttl)
+        if self.mode == "record":
+            self.cassette.record(namespace, key, body)
+
+    def post_json(
+        self,
+        namespace: str,
+        key: str,
+        url: str,
+        payload: dict,
+        ttl: float,
+        bucket: TokenBucket,
+        headers: Optional[dict] = None,
+    ) -> Optional[Any]:
+        """POST and return the JSON body, or None on a non-200 response."""
+        cached = self._lookup(namespace, key)
+        if cached is not None:
+            return cached
+        bucket.acquire()
+        response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        body = response.json()
+        self._store(namespace, key, body, ttl)
+        return body
+
+    async def post_json_async(
+        self,
+        namespace: str,
+        key: str,
+        url: str,
+        payload: dict,
+        ttl: float,
+        bucket: TokenBucket,
+        headers: Optional[dict] = None,
+    ) -> Optional[Any]:
+        """Async POST and return the JSON body, or None on a non-200 response."""
+        # Cache and cassette access is blocking disk I/O; keep it off the event loop
+        cached = await asyncio.to_thread(self._lookup, namespace, key)
+        if cached is not None:
+            return cached
+        await bucket.acquire_async()
+        response = await self.async_client.post(url, json=payload, headers=headers)
+        if response.status_code != 200:
+            return None
+        body = response.json()
+        await asyncio.to_thread(self._store, namespace, key, body, ttl)
+        return body
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+_client: Optional[ToolHTTPClient] = None
+
+
+def get_client() -> ToolHTTPClient:
+    """Return the process-wide tool HTTP client."""
+    global _client
+    if _client is None:
+        _client = ToolHTTPClient()
+    return _client
@@ -1,39 +1,100 @@
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import torch
 import torch.nn as nn
 import torch.optim as optim
-import pandas as pd
-
-# 1. Load Data
-df = pd.read_csv('data/dubai_data.csv')
-# Features: everything except the 'neighborhood' and 'priority_score'
-X = torch.tensor(df[['population']].values, dtype=torch.float32)
-# Target: the 'priority_score'
-y = torch.tensor(df[['population']].values, dtype=torch.float32)
-
-# Look for a line like this and change the 4 to a 1
-model = nn.Sequential(
-    nn.Linear(1, 8),  # Change this from 4 to 1
-    nn.ReLU(),
-    nn.Linear(8, 1)
-)
-# 3. Loss and Optimizer
-criterion = nn.MSELoss() # Mean Squared Error (good for predicting scores)
-optimizer = optim.Adam(model.parameters(), lr=0.01)
-
-# 4. The Training Loop
-print("Starting training...")
-for epoch in range(100):
-    optimizer.zero_grad()
-    outputs = model(X)
-    loss = criterion(outputs, y)
-    loss.backward()
-    optimizer.step()
-    
-    if (epoch+1) % 10 == 0:
-        print(f'Epoch [{epoch+1}/100], Loss: {loss.item():.4f}')
-
-# 5. Save the result
-import os
-os.makedirs('models', exist_ok=True)
-torch.save(model.state_dict(), "models/model.pth")
-print("Model trained and saved to models/model.pth!")
\ No newline at end of file
+
+from scripts.feature_store import FEATURE_NAMES, FeatureStore, STORE_PATH
+
+MODEL_DIR = "models"
+MODEL_PATH = os.path.join(MODEL_DIR, "model.pth")
+CONFIG_PATH = os.path.join(MODEL_DIR, "model_config.json")
+
+# priority_target is computed from these, and population_density / population_growth_rate
+# reproduce population_2022 exactly from area / 2018 population. With any of them as
+# inputs the model would just relearn the target's formula, so it never sees them.
+TARGET_SOURCE_FEATURES = ("population_2022", "population_density", "population_growth_rate", "stop_count")
+MODEL_FEATURES = tuple(name for name in FEATURE_NAMES if name not in TARGET_SOURCE_FEATURES)
+
+
+def build_model(input_dim, hidden_sizes=(8,)):
+    layers = []
+    for hidden in hidden_sizes:
+        layers += [nn.Linear(input_dim, hidden), nn.ReLU()]
+        input_dim = hidden
+    layers.append(nn.Linear(input_dim, 1))
+    return nn.Sequential(*layers)
+
+
+def build_model_from_state_dict(state_dict):
+    # Recover the layer sizes from the saved weights (Linear weights are [out, in])
+    weights = [v for k, v in state_dict.items() if k.endswith("weight")]
+    hidden_sizes = tuple(w.shape[0] for w in weights[:-1])
+    model = build_model(weights[0].shape[1], hidden_sizes)
+    model.load_state_dict(state_dict)
+    return model
+
+
+def priority_target(store):
+    # Priority is high where many people live and few stops serve them (2022); the
+    # model predicts it from earlier population, area and route supply (MODEL_FEATURES)
+    population = torch.tensor(store.column("population_2022"), dtype=torch.float32)
+    stops = torch.tensor(store.column("stop_count"), dtype=torch.float32)
+    pop_norm = (population - population.min()) / (population.max() - population.min())
+    stop_norm = (stops - stops.min()) / (stops.max() - stops.min())
+    return (pop_norm * (1 - stop_norm)).reshape(-1, 1)
+
+
+def load_training_data(store=None):
+    # 1. Load Data: one normalized feature row per community from the feature store
+    store = store or FeatureStore.load(STORE_PATH)
+    X = torch.tensor(store.normalized[:, store.indices(MODEL_FEATURES)], dtype=torch.float32)
+    # Target: the 'priority_score'
+    y = priority_target(store)
+    return store, X, y
+
+
+def save_model(model, config, model_path=MODEL_PATH, config_path=CONFIG_PATH):
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    torch.save(model.state_dict(), model_path)
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def main(epochs=100, lr=0.01, hidden_sizes=(8,)):
+    store, X, y = load_training_data()
+
+    model = build_model(X.shape[1], hidden_sizes)
+    # 3. Loss and Optimizer
+    criterion = nn.MSELoss() # Mean Squared Error (good for predicting scores)
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+
+    # 4. The Training Loop
+    print("Starting training...")
+    for epoch in range(epochs):
+        optimizer.zero_grad()
+        outputs = model(X)
+        loss = criterion(outputs, y)
+        loss.backward()
+        optimizer.step()
+
+        if (epoch+1) % 10 == 0:
+            print(f'Epoch [{epoch+1}/{epochs}], Loss: {loss.item():.4f}')
+
+    # 5. Save the result, with the feature schema it was trained on
+    save_model(model, {
+        "schema_version": store.schema_version,
+        "feature_names": list(MODEL_FEATURES),
+        "hidden_sizes": list(hidden_sizes),
+        "lr": lr,
+        "epochs": epochs,
+        "final_loss": loss.item(),
+    })
+    print(f"Model trained and saved to {MODEL_PATH}!")
+
+
+if __name__ == "__main__":
+    main()